@@ -184,4 +184,31 @@ void handleProfile(const String &line) {
       Serial.print("ERR1\n"); // BadCmd
       return;
   }
+}
+
+void handleAxisProfile(const String &line) {
+  // Format: Q<eje><param><value>, value may have decimals
+  digitalWrite(ENABLE_PIN, LOW);
+  uint8_t axis = line.charAt(1) - '1';
+  if (axis >= 6) {
+    Serial.print("ERR2\n");
+    return;
+  }
+  char param = line.charAt(2);
+  float val = line.substring(3).toFloat();
+  if (val <= 0) {
+    Serial.print("ERR1\n"); // BadCmd
+    return;
+  }
+  switch (param) {
+    case 'V':
+      steppers[axis].setMaxSpeed(val);
+      break;
+    case 'A':
+      steppers[axis].setAcceleration(val);
+      break;
+    default:
+      Serial.print("ERR1\n"); // BadCmd
+      return;
+  }
 }
\ No newline at end of file
@@ -19,5 +19,6 @@ void handleHoming(const String &line);
 void emergencyStop();
 void handleKillAxis(const String &line);
 void handleProfile(const String &line);
+void handleAxisProfile(const String &line);
 
 #endif // MOTION_H
\ No newline at end of file
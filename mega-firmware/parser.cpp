@@ -48,6 +48,10 @@ void parseLine(const String &line) {
       handleProfile(line);
       break;
 
+    case 'Q':  // Per-axis profile: Q<eje><param><v>
+      handleAxisProfile(line);
+      break;
+
     default:
       Serial.print("ERR1\n");  // BadCmd
       ok = false;
@@ -4,14 +4,15 @@ Minimalistic light theme with icon tabs.
 """
 import customtkinter as ctk
 import threading
-import time
 import os
 
 from config import (
     WINDOW_WIDTH, WINDOW_HEIGHT, WINDOW_TITLE,
-    SERIAL_PORT, STATUS_POLL_INTERVAL
+    SERIAL_PORT, STATUS_POLL_INTERVAL, STATUS_IDLE_POLL_INTERVAL
 )
 from robot_client import RobotClient
+from port_registry import PortRegistry
+from robot_events import MoveDone, EndstopHit, ConnectionChanged
 from path_manager import PathManager
 from ui.theme import COLORS
 from ui.components import IconTabBar
@@ -54,9 +55,20 @@ class RobotApp(ctk.CTk):
     
     def _init_services(self):
         """Initialize backend services."""
-        self.client = RobotClient(port=SERIAL_PORT)
+        # Port list kept current by hotplug events, shared by the client and UI
+        self.port_registry = PortRegistry()
+        self.port_registry.start()
+        self.client = RobotClient(port=SERIAL_PORT, port_registry=self.port_registry)
         self.path_manager = PathManager()
         self.running = True
+        # Sequence number of the last snapshot shown in the UI
+        self._ui_seq = None
+        
+        # Wake the status loop as soon as an axis stops
+        self.status_wakeup = threading.Event()
+        self.client.events.subscribe(MoveDone, self._on_motion_event)
+        self.client.events.subscribe(EndstopHit, self._on_motion_event)
+        self.client.events.subscribe(ConnectionChanged, self._on_connection_event)
     
     def _build_ui(self):
         """Build the main UI structure."""
@@ -74,7 +86,7 @@ class RobotApp(ctk.CTk):
     
     def _build_control_tab(self, parent):
         """Build control tab content."""
-        self.control_tab = ControlTab(parent, self.client)
+        self.control_tab = ControlTab(parent, self.client, self.port_registry)
         return self.control_tab
     
     def _build_settings_tab(self, parent):
@@ -106,18 +118,41 @@ class RobotApp(ctk.CTk):
             if self.client.connected:
                 self.client.update_status()
                 self.after(0, self._update_ui_status)
-            time.sleep(STATUS_POLL_INTERVAL)
+            
+            # Poll fast only while something moves; D<n>/ENDSTOP<n> wake us early
+            if self.client.state.moving_axes:
+                interval = STATUS_POLL_INTERVAL
+            else:
+                interval = STATUS_IDLE_POLL_INTERVAL
+            self.status_wakeup.wait(interval)
+            self.status_wakeup.clear()
+    
+    def _on_motion_event(self, event):
+        """Refresh status right after an axis stops (called on reader thread)."""
+        self.status_wakeup.set()
+    
+    def _on_connection_event(self, event):
+        """Reflect link drops/reconnects right away (called on a client thread)."""
+        self.after(0, self._update_ui_status)
+        self.status_wakeup.set()
     
     def _update_ui_status(self):
         """Update UI components with current robot status."""
+        state = self.client.state
+        if state.seq == self._ui_seq:
+            return
+        self._ui_seq = state.seq
         if hasattr(self, 'control_tab'):
             self.control_tab.update_status(
-                self.client.status,
-                self.client.axes
+                state.status,
+                state.axes
             )
     
     def _on_close(self):
         """Clean up resources on application close."""
         self.running = False
+        self.status_wakeup.set()
         self.client.disconnect()
+        self.port_registry.stop()
+        self.path_manager.close()
         self.destroy()
@@ -13,6 +13,9 @@ from datetime import datetime
 import sys
 import os
 
+from telemetry import TelemetryState, parse_telemetry
+from serial_link import open_port, wait_until_ready
+
 class ArduinoTester:
     """Clase para manejar pruebas de comunicación con Arduino Mega"""
     
@@ -82,31 +85,26 @@ class ArduinoTester:
             
             logging.info(f"Conectando a {puerto} a {self.baudrate} baudios...")
             
-            self.serial_port = serial.Serial(
-                port=puerto,
-                baudrate=self.baudrate,
+            # Abrir sin pulsar DTR para no resetear la placa si ya está corriendo
+            self.serial_port = open_port(
+                puerto,
+                self.baudrate,
                 timeout=self.timeout,
                 write_timeout=2
             )
-            
-            time.sleep(2)  # Esperar a que se estabilice la conexión
+            self.is_connected = True
             
             # --- VERIFICACIÓN DE HANDSHAKE ---
+            # Sondear con "S" hasta recibir telemetría válida (en lugar de esperar 2s fijos)
             logging.info("Verificando dispositivo (Handshake)...")
-            self.is_connected = True # Temporalmente True para permitir enviar_comando
-            
-            # Intentar obtener respuesta válida
-            respuesta = self.enviar_comando("S", esperar_respuesta=True)
+            tiempo_listo = wait_until_ready(self.serial_port)
             
-            if not respuesta:
-                logging.error("❌ Handshake fallido: El dispositivo no respondió")
+            if tiempo_listo is None:
+                logging.error("❌ Handshake fallido: El dispositivo no respondió con telemetría")
                 self.desconectar()
                 return False
-                
-            if not respuesta.startswith("S:"):
-                logging.warning(f"⚠️ Respuesta inesperada durante handshake: {respuesta}")
             
-            logging.info("✅ Conexión exitosa con Arduino Mega")
+            logging.info(f"✅ Conexión exitosa con Arduino Mega (lista en {tiempo_listo * 1000:.0f} ms)")
             return True
             
         except serial.SerialException as e:
@@ -186,15 +184,12 @@ class ArduinoTester:
         respuesta = self.enviar_comando("S")  # Status request
         tiempo_respuesta = time.time() - inicio
         
-        if respuesta and respuesta.startswith("S:"):
+        estado = TelemetryState()
+        if respuesta and parse_telemetry(respuesta, estado):
             logging.info(f"✅ Conexión exitosa (tiempo: {tiempo_respuesta:.3f}s)")
-            # Parsear la respuesta para mostrar información útil
-            try:
-                partes = respuesta.split(":")[1].split(",")
-                posiciones = partes[:6]  # Primeras 6 son posiciones
-                logging.info(f"📊 Posiciones actuales: {posiciones}")
-            except:
-                logging.info("📊 Respuesta de telemetría recibida")
+            # Mostrar información útil de la telemetría
+            logging.info(f"📊 Posiciones actuales: {estado.positions}")
+            logging.info(f"📊 Finales de carrera (MIN): {estado.endstops_bits()}")
             return True
         else:
             logging.error(f"❌ Falló prueba de conexión. Respuesta: {respuesta}")
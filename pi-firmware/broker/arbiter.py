@@ -0,0 +1,237 @@
+"""
+Arbitraje de varios clientes sobre el único enlace serie con el Mega.
+
+ - Cola por cliente y turno rotativo: cada cliente con comandos pendientes
+   envía uno por vuelta, así un cliente que inunda no deja sin turno a otro.
+ - Ventana de crédito (flow_control.CreditWindow): no hay más comandos sin
+   respuesta de los que caben en el buffer RX del Mega.
+ - Cola acotada: a lo sumo `max_queued` comandos esperan crédito entre todos
+   los clientes; qué hacer al llenarse lo decide el broker (`outbox`).
+ - Lease de movimiento: `L1` reserva los comandos de movimiento para un
+   cliente, `L0` lo libera (también al desconectarse). Sin lease, cualquiera
+   puede mover. `E` nunca se restringe.
+ - Ruteo de respuestas: el Mega contesta en orden, así que OK/ERR<n> van al
+   cliente del comando más antiguo en vuelo. La telemetría y las líneas no
+   solicitadas (D<n>, ENDSTOP<n>) se difunden a todos.
+"""
+import logging
+import time
+from collections import deque
+
+from flow_control import CreditWindow
+from telemetry import is_telemetry
+
+# Comandos que mueven o reconfiguran el robot (sujetos al lease)
+MOTION_LETTERS = frozenset('MAHKPQT')
+# parser.cpp imprime ERR<n> y después su propio OK para estos comandos
+ACK_AFTER_ERROR = frozenset('MAHKPQ')
+
+MAX_QUEUED = 32
+
+REPLY_TIMEOUT = 1.0
+# El homing bloquea al Mega hasta tocar el final de carrera (20 s máximo)
+HOMING_REPLY_TIMEOUT = 25.0
+
+
+class _InFlight:
+    __slots__ = ('client', 'letter', 'nbytes', 'credited', 'sent', 'deadline', 'error')
+
+    def __init__(self, client, letter, nbytes, credited, sent, deadline):
+        self.client = client
+        self.letter = letter
+        self.nbytes = nbytes
+        self.credited = credited
+        self.sent = sent
+        self.deadline = deadline
+        self.error = False
+
+
+class CommandArbiter:
+    """Colas por cliente, turno rotativo, lease de movimiento y ruteo de respuestas."""
+
+    def __init__(self, window, buffer_size, reply_timeout=REPLY_TIMEOUT,
+                 homing_timeout=HOMING_REPLY_TIMEOUT, on_finish=None,
+                 max_queued=MAX_QUEUED):
+        self.credits = CreditWindow(window, buffer_size)
+        self.max_queued = max_queued
+        self.reply_timeout = reply_timeout
+        self.homing_timeout = homing_timeout
+        # on_finish(letra, segundos_desde_envío, resultado) al cerrar cada
+        # comando; resultado es 'ok', 'error' o 'timeout' (ver metrics.py)
+        self.on_finish = on_finish
+        self.owner = None
+        self._queues = {}        # cliente → deque de (data, letra)
+        self._ring = deque()     # clientes con comandos en cola, en orden de turno
+        self._count = 0          # comandos en todas las colas
+        self._in_flight = deque()
+
+    # --- Lease de movimiento ---
+
+    def acquire(self, client):
+        if self.owner is None or self.owner is client:
+            self.owner = client
+            return True
+        return False
+
+    def release(self, client):
+        if self.owner is client:
+            self.owner = None
+            return True
+        return False
+
+    def may_move(self, client):
+        return self.owner is None or self.owner is client
+
+    # --- Colas ---
+
+    def enqueue(self, client, data, letter):
+        """Agrega un comando a la cola de `client` (el límite lo controla quien llama)."""
+        queue = self._queues.get(client)
+        if queue is None:
+            queue = self._queues[client] = deque()
+            self._ring.append(client)
+        queue.append((data, letter))
+        self._count += 1
+
+    def queued(self):
+        return self._count
+
+    def full(self):
+        return self._count >= self.max_queued
+
+    def has_absolute(self, client, axis):
+        """¿Tiene `client` un absoluto en cola para `axis` (1-6)?"""
+        target = 48 + axis
+        queue = self._queues.get(client) or ()
+        return any(letter == 'A' and data[1] == target for data, letter in queue)
+
+    def coalesce(self, client, data, letter):
+        """Reemplaza un absoluto en cola del mismo cliente y eje por `data`.
+
+        El destino nuevo vuelve al final de la cola, detrás de lo que el
+        cliente envió después del anterior. Devuelve False si no había uno.
+        """
+        queue = self._queues.get(client)
+        if letter != 'A' or not queue:
+            return False
+        axis = data[1]
+        for index, (queued, queued_letter) in enumerate(queue):
+            if queued_letter == 'A' and queued[1] == axis:
+                del queue[index]
+                queue.append((data, letter))
+                return True
+        return False
+
+    def outstanding(self, client):
+        """Comandos de `client` en cola o esperando respuesta."""
+        queue = self._queues.get(client)
+        count = len(queue) if queue else 0
+        return count + sum(1 for entry in self._in_flight if entry.client is client)
+
+    def pop_ready(self):
+        """Siguiente comando en turno si entra en la ventana: (cliente, data, letra)."""
+        if not self._ring:
+            return None
+        client = self._ring[0]
+        queue = self._queues[client]
+        data, letter = queue[0]
+        if not self.credits.try_acquire(len(data)):
+            return None
+        queue.popleft()
+        self._count -= 1
+        self._ring.popleft()
+        if queue:
+            self._ring.append(client)
+        else:
+            del self._queues[client]
+        self._track(client, data, letter, credited=True)
+        return client, data, letter
+
+    def sent_direct(self, client, data, letter):
+        """Registra un comando escrito sin pasar por la cola (p. ej. E)."""
+        credited = self.credits.try_acquire(len(data))
+        self._track(client, data, letter, credited)
+
+    def drop_motion(self):
+        """Descarta los comandos de movimiento aún en cola. Devuelve cuántos."""
+        dropped = 0
+        for client in list(self._queues):
+            queue = self._queues[client]
+            kept = deque(item for item in queue if item[1] not in MOTION_LETTERS)
+            dropped += len(queue) - len(kept)
+            self._count -= len(queue) - len(kept)
+            if kept:
+                self._queues[client] = kept
+            else:
+                del self._queues[client]
+                self._ring.remove(client)
+        return dropped
+
+    def client_gone(self, client):
+        """Olvida la cola y el lease de un cliente desconectado."""
+        queue = self._queues.pop(client, None)
+        if queue is not None:
+            self._count -= len(queue)
+            self._ring.remove(client)
+        self.release(client)
+        # Sus respuestas todavía llegarán: se descartan al rutearlas
+        for entry in self._in_flight:
+            if entry.client is client:
+                entry.client = None
+
+    def reset(self):
+        """El enlace con el Mega se reabrió: nada sigue en vuelo."""
+        self._in_flight.clear()
+        self.credits.reset()
+
+    # --- Respuestas del Mega ---
+
+    def _track(self, client, data, letter, credited):
+        timeout = self.homing_timeout if letter == 'H' else self.reply_timeout
+        now = time.monotonic()
+        self._in_flight.append(_InFlight(client, letter, len(data), credited,
+                                         now, now + timeout))
+
+    def _finish(self, outcome):
+        entry = self._in_flight.popleft()
+        if entry.credited:
+            self.credits.release(entry.nbytes)
+        if self.on_finish is not None:
+            if entry.error and outcome == 'ok':
+                outcome = 'error'
+            self.on_finish(entry.letter, time.monotonic() - entry.sent, outcome)
+        return entry
+
+    def route_reply(self, raw):
+        """Clasifica una línea del Mega.
+
+        Devuelve (es_respuesta, cliente): si es_respuesta, la línea va solo a
+        `cliente` (None si ya se desconectó); si no, se difunde a todos. Para
+        la telemetría que cierra un S, `cliente` indica quién lo pidió.
+        """
+        if not self._in_flight:
+            return False, None
+        head = self._in_flight[0]
+        if raw[:2] == b'OK':
+            self._finish('ok')
+            return True, head.client
+        if raw[:3] == b'ERR':
+            if head.letter in ACK_AFTER_ERROR:
+                head.error = True
+            else:
+                self._finish('error')
+            return True, head.client
+        if is_telemetry(raw) and head.letter == 'S':
+            # La telemetría se difunde, pero cierra el S pendiente
+            self._finish('ok')
+            return False, head.client
+        return False, None
+
+    def expire(self, now):
+        """Descarta respuestas vencidas; devuelve segundos hasta el próximo vencimiento."""
+        while self._in_flight and self._in_flight[0].deadline <= now:
+            entry = self._finish('timeout')
+            logging.warning(f"Sin respuesta del Mega a {entry.letter}; se descarta")
+        if not self._in_flight:
+            return None
+        return max(0.0, self._in_flight[0].deadline - now)
@@ -6,30 +6,133 @@ También recoge respuestas del Mega y las envía de vuelta al PC.
 Implementa:
  - Creación del directorio de logs
  - Heartbeat (`C\n` → `c\n`)
- - Conversión de unidades (grados `G` o pasos `S`) a pasos
+ - Conversión de unidades (grados `G`, radianes `R` o pasos `S`) a pasos, con
+   tabla precalculada por eje (ver units.py)
  - ACK inmediato (`OK\n`) para comandos válidos
  - Envío de errores de protocolo
  - Manejo de reconexión automática
- - Logging robusto y validación de configuración
+ - Logging asíncrono con rotación (ver broker_logging.py) y validación de configuración
+
+Modos de ejecución (`mode` en config.yaml):
+ - `loop` (por defecto): un único hilo con `selectors` atiende ambos puertos
+   con descriptores no bloqueantes. Reenvía cada línea en cuanto llega y
+   `stop()` termina de inmediato gracias a un self-pipe.
+ - `threads`: el esquema original, un hilo por dirección con `readline()`.
+
+Varios clientes (solo modo loop, sección `clients` de config.yaml): además
+del puerto `pc`, el broker acepta conexiones TCP y/o por socket Unix. Los
+comandos de todos se intercalan hacia el Mega por turnos (ver arbiter.py),
+`L1`/`L0` toma/libera el lease exclusivo de movimiento, las respuestas OK/ERR
+del Mega vuelven a quien envió el comando y la telemetría y D<n>/ENDSTOP<n>
+se difunden a todos.
+
+Caché de telemetría (sección `telemetry_cache`): el broker consulta `S` al
+Mega a una frecuencia fija y contesta los `S` de los clientes desde la última
+línea recibida, con un sufijo ` age=<ms>`. Así la frecuencia de consulta de
+los clientes no multiplica el tráfico serie ni le quita ciclos a
+`updateMotors()` en el Mega.
+
+Cola acotada hacia el Mega (sección `outbox`): los comandos esperan en el
+broker hasta que el Mega respondió lo anterior o hay crédito en su buffer RX
+(ver arbiter.py), y nunca hay más de `max_commands` esperando. Con la cola
+llena, `overflow` decide: `block` deja de leer al cliente hasta que haya
+lugar, `reject` contesta `ERR8:Busy` y `coalesce` reemplaza el destino
+absoluto (`A`) ya encolado del mismo eje (si no hay uno, `ERR8:Busy`).
+
+Framing binario (ver framing.py, solo modo loop): un cliente que envía `B1`
+recibe `OK:B1` y desde ahí intercambia tramas con longitud y CRC16 en ambos
+sentidos; el broker las traduce al ASCII del Mega en el borde. Una trama
+corrupta se descarta (contesta `ERR9:BadFrame`) y nunca llega al Mega. `B0`
+vuelve a ASCII. Con framing no hay ACK inmediato: el único OK de cada comando
+es el del Mega.
+
+Captura (sección `capture`, ver capture.py y replay.py): graba cada línea
+que entra o sale del broker, en ambos sentidos, en un archivo binario con
+marcas de tiempo monotónicas que se puede reproducir después.
+
+Métricas (sección `metrics`, ver metrics.py): latencia real de cada comando
+reenviado hasta el OK/ERR del Mega y de cada M/A/K hasta su D<n>, contadores
+de tráfico, errores y reconexiones, servidos en formato Prometheus por HTTP.
 """
 import os
+import sys
 import serial
+import selectors
+import socket
 import threading
 import yaml
-import re
 import time
 import logging
 
-# Asegurar existencia del directorio de logs
-os.makedirs('logs', exist_ok=True)
-
-# Configurar logging
-glogging = logging.getLogger()
-logging.basicConfig(
-    filename='logs/broker.log',
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s'
+# Módulos compartidos con la aplicación (pi-firmware/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from telemetry import TelemetryState, is_telemetry, parse_telemetry
+from units import StepConverter
+from config import PIPELINE_WINDOW, MEGA_RX_BUFFER_SIZE
+from arbiter import CommandArbiter, MOTION_LETTERS, MAX_QUEUED
+from broker_logging import setup_logging, traffic_log, telemetry_log, LazyLine
+from metrics import BrokerMetrics, MetricsServer
+from framing import T_NOISE, FrameError, read_frame, decode_frame, encode_lines
+from capture import (
+    CaptureWriter, QUEUE_SIZE, BROADCAST, MAX_CHANNEL, CLIENT_TO_BROKER, BROKER_TO_MEGA,
+    MEGA_TO_BROKER, BROKER_TO_CLIENT
 )
+from dispatch import (
+    CommandDispatcher, validate_bare, validate_axis, validate_number,
+    validate_profile, validate_axis_profile, validate_move, validate_switch
+)
+
+
+# Una línea sin '\n' más larga que esto es basura: se descarta
+MAX_LINE_LENGTH = 1024
+# Un cliente de socket con más bytes sin leer que esto se desconecta
+MAX_CLIENT_BACKLOG = 64 * 1024
+# Un cliente en pausa se sigue leyendo (para ver un E) hasta acumular esto
+MAX_PAUSED_BUFFER = 16 * 1024
+
+# Remitente de las consultas S propias del broker (caché de telemetría)
+POLLER = 'poller'
+
+# Comandos que terminan con D<n> (o ENDSTOP<n>) del eje
+DONE_LETTERS = frozenset('MAK')
+
+OVERFLOW_POLICIES = ('block', 'reject', 'coalesce')
+
+
+class _Endpoint:
+    """Puerto serie o cliente atendido por el event loop, con buffers propios.
+
+    `kind` es 'mega', 'pc' (puerto serie del PC) o 'socket'.
+    """
+
+    def __init__(self, name, handle, on_line, kind):
+        self.name = name
+        self.handle = handle
+        self.fd = handle.fileno()
+        self.on_line = on_line
+        self.kind = kind
+        self.closed = False
+        # Sin leer mientras la cola hacia el Mega esté llena (política block)
+        self.paused = False
+        # Tramas binarias en lugar de líneas ASCII (negociado con B1)
+        self.framed = False
+        # Canal en las capturas: 0 = puerto PC o el Mega, 1-254 = sockets
+        self.channel = 0
+        self.rbuf = bytearray()
+        self.wbuf = bytearray()
+
+    def __repr__(self):
+        return f"<{self.name}>"
+
+
+class _Listener:
+    """Socket que acepta clientes (TCP o Unix)."""
+
+    def __init__(self, sock, label, path=None):
+        self.sock = sock
+        self.label = label
+        self.path = path
+
 
 class SerialBroker:
     def __init__(self, config_path='config.yaml'):
@@ -43,108 +146,497 @@ class SerialBroker:
             raise KeyError("Faltan claves 'ports' o 'axes' en config.yaml")
         self.pc_port = cfg['ports'].get('pc')
         self.mega_port = cfg['ports'].get('mega')
-        if not self.pc_port or not self.mega_port:
-            raise KeyError("Define 'pc' y 'mega' en la sección 'ports' de config.yaml")
+        # Clientes por socket (opcional): tcp 'host:puerto' y/o ruta unix
+        clients = cfg.get('clients') or {}
+        self.tcp_address = clients.get('tcp')
+        self.unix_path = clients.get('unix')
+        self.max_clients = clients.get('max_clients', 8)
+        self.mega_window = clients.get('window', PIPELINE_WINDOW)
+        has_sockets = bool(self.tcp_address or self.unix_path)
+        if not self.mega_port or not (self.pc_port or has_sockets):
+            raise KeyError("Define 'mega' y 'pc' en la sección 'ports' (o clientes en 'clients') de config.yaml")
         self.baudrate = cfg.get('baudrate', 115200)
         self.timeout = cfg.get('timeout', 1.0)
         self.axes = cfg['axes']
+        # Tabla pasos/unidad por eje; falla aquí si falta configuración
+        self.converter = StepConverter(self.axes)
+        # Cola + hilo escritor: el reenvío nunca espera al disco
+        self._log_listener = setup_logging(cfg.get('logging'))
+        self.mode = cfg.get('mode', 'loop')
+        if self.mode not in ('loop', 'threads'):
+            raise ValueError(f"mode inválido en config.yaml: {self.mode!r} (usar 'loop' o 'threads')")
+        if self.mode == 'threads' and (has_sockets or not self.pc_port):
+            raise ValueError("Los clientes por socket requieren mode: loop")
+
+        # Último estado reportado por el Mega (se reutiliza en cada línea S:)
+        self.telemetry = TelemetryState()
+        # Caché: última línea de telemetría (sin '\n') y cuándo llegó
+        cache = cfg.get('telemetry_cache') or {}
+        self.cache_enabled = cache.get('enabled', True)
+        poll_hz = cache.get('poll_hz', 10)
+        if self.cache_enabled and poll_hz <= 0:
+            raise ValueError("telemetry_cache.poll_hz debe ser mayor que 0")
+        self.poll_interval = 1.0 / poll_hz if self.cache_enabled else None
+        self._telemetry_line = None
+        self._telemetry_time = 0.0
+
+        # Cola acotada hacia el Mega y qué hacer cuando se llena
+        outbox = cfg.get('outbox') or {}
+        self.max_queued = outbox.get('max_commands', MAX_QUEUED)
+        self.overflow = outbox.get('overflow', 'block')
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"outbox.overflow inválido: {self.overflow!r} "
+                             f"(usar {', '.join(OVERFLOW_POLICIES)})")
+        # Protege al árbitro en modo threads; su condición despierta a quien
+        # espera lugar en la cola (política block)
+        self._outbox = threading.Condition(threading.RLock())
+
+        # Tabla de comandos del PC, indexada por la letra
+        self.dispatcher = CommandDispatcher()
+        self.dispatcher.register('C', self._on_heartbeat, validate_bare)
+        self.dispatcher.register('M', self._on_move, validate_move)
+        self.dispatcher.register('A', self._on_move, validate_move)
+        # Se reenvían tal cual: H, S, E, K, P, Q, T
+        self.dispatcher.register('H', self._on_forward, validate_axis)
+        self.dispatcher.register('S', self._on_status, validate_bare)
+        self.dispatcher.register('E', self._on_forward, validate_bare)
+        self.dispatcher.register('K', self._on_forward, validate_axis)
+        self.dispatcher.register('P', self._on_forward, validate_profile)
+        self.dispatcher.register('Q', self._on_forward, validate_axis_profile)
+        self.dispatcher.register('T', self._on_forward, validate_number)
+        # Lease de movimiento (lo resuelve el broker, no llega al Mega)
+        self.dispatcher.register('L', self._on_lease, validate_switch)
+        # Negociación del framing binario (tampoco llega al Mega)
+        self.dispatcher.register('B', self._on_framing, validate_switch)
 
-        # Regex para comandos
-        self.cmd_regex = re.compile(r'^([MA])([1-6])([+-]?\d+)([GS])?\n$')
-        self.homing_regex = re.compile(r'^(H[1-6])\n$')
-        self.status_regex = re.compile(r'^(S)\n$')
-        self.estop_regex = re.compile(r'^(E)\n$')
-        self.kill_regex = re.compile(r'^(K[1-6])\n$')
-        self.profile_regex = re.compile(r'^(P[VA]\d+)\n$')
-        self.timeout_regex = re.compile(r'^(T\d+)\n$')
+        # Latencias y contadores; el HTTP solo si está habilitado
+        self.metrics = BrokerMetrics()
+        metrics_cfg = cfg.get('metrics') or {}
+        self.metrics_server = None
+        if metrics_cfg.get('enabled', False):
+            self.metrics_server = MetricsServer(
+                self.metrics, metrics_cfg.get('address', '127.0.0.1:9108'))
+        # Eje (1-6) → (letra, instante de envío) del último M/A/K sin D<n>
+        self._motion_sent = [None] * 7
+
+        # Grabación del tráfico para reproducirlo con replay.py
+        capture_cfg = cfg.get('capture') or {}
+        self.capture = None
+        if capture_cfg.get('enabled', False):
+            self.capture = CaptureWriter.in_directory(
+                capture_cfg.get('dir', 'captures'),
+                int(capture_cfg.get('queue_size', QUEUE_SIZE)))
+
+        # Turnos, lease y ruteo de respuestas entre clientes
+        self.arbiter = CommandArbiter(self.mega_window, MEGA_RX_BUFFER_SIZE,
+                                      on_finish=self._on_command_finished,
+                                      max_queued=self.max_queued)
 
         self.running = True
-        self.thread_pc = threading.Thread(target=self._read_pc_loop, daemon=True)
-        self.thread_mega = threading.Thread(target=self._read_mega_loop, daemon=True)
+        self._stop_event = threading.Event()
+        # Serializa la (re)apertura de puertos entre hilos; _serial_gen cuenta
+        # las aperturas para que un segundo hilo no reabra lo ya reabierto
+        self._serial_lock = threading.Lock()
+        self._serial_gen = 0
+        self.ser_pc = None
+        self.ser_mega = None
+
+        if self.mode == 'loop':
+            # Self-pipe: stop() escribe un byte y despierta al select()
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            self._selector = None
+            self._pc_ep = None
+            self._mega_ep = None
+            # Todos los destinatarios de la difusión: puerto PC + sockets
+            self._clients = []
+            # Clientes sin leer hasta que la cola tenga lugar (política block)
+            self._paused = []
+            self._listeners = []
+            self._client_seq = 0
+            self.threads = [threading.Thread(target=self._run_loop, daemon=True)]
+        else:
+            self.threads = [
+                threading.Thread(target=self._read_pc_loop, daemon=True),
+                threading.Thread(target=self._read_mega_loop, daemon=True),
+            ]
+            if self.cache_enabled:
+                self.threads.append(threading.Thread(target=self._poll_loop, daemon=True))
 
         self._open_serials()
 
-    def _open_serials(self):
-        # Intentar abrir puertos con reconexión cada 2s
-        while True:
-            try:
-                self.ser_pc = serial.Serial(self.pc_port, self.baudrate, timeout=self.timeout)
-                self.ser_mega = serial.Serial(self.mega_port, self.baudrate, timeout=self.timeout)
-                logging.info(f"Puertos abiertos: PC={self.pc_port}, Mega={self.mega_port}")
-                break
-            except serial.SerialException as e:
-                logging.error(f"Error abrir puertos: {e}. Reintentando en 2s...")
-                time.sleep(2)
+    def _open_serials(self, failed_gen=None):
+        """Abre (o reabre) ambos puertos, reintentando cada 2s.
+
+        Si se indica `failed_gen` y otro hilo ya reabrió los puertos tras ese
+        mismo fallo, no hace nada.
+        """
+        with self._serial_lock:
+            if failed_gen is not None and failed_gen != self._serial_gen:
+                return
+            self._close_serials()
+            # En modo loop los puertos no bloquean: el selector espera por ellos
+            timeout = 0 if self.mode == 'loop' else self.timeout
+            while not self._stop_event.is_set():
+                try:
+                    if self.pc_port:
+                        self.ser_pc = serial.Serial(self.pc_port, self.baudrate, timeout=timeout)
+                    self.ser_mega = serial.Serial(self.mega_port, self.baudrate, timeout=timeout)
+                    self._serial_gen += 1
+                    if self._serial_gen > 1:
+                        self.metrics.inc('reconnects')
+                    if self.mode != 'loop':
+                        with self._outbox:
+                            self.arbiter.reset()
+                            self._outbox.notify_all()
+                    logging.info(f"Puertos abiertos: PC={self.pc_port}, Mega={self.mega_port}")
+                    return
+                except serial.SerialException as e:
+                    self._close_serials()
+                    logging.error(f"Error abrir puertos: {e}. Reintentando en 2s...")
+                    self._stop_event.wait(2)
+
+    def _close_serials(self):
+        for ser in (self.ser_pc, self.ser_mega):
+            if ser is not None:
+                try:
+                    ser.close()
+                except Exception:
+                    pass
+        self.ser_pc = None
+        self.ser_mega = None
 
     def start(self):
-        self.thread_pc.start()
-        self.thread_mega.start()
-        logging.info("SerialBroker iniciado.")
+        self._register_gauges()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        for thread in self.threads:
+            thread.start()
+        logging.info(f"SerialBroker iniciado (modo {self.mode}).")
         print("SerialBroker iniciado.")
 
     def stop(self):
         self.running = False
-        self.thread_pc.join()
-        self.thread_mega.join()
-        try:
-            self.ser_pc.close()
-            self.ser_mega.close()
-        except Exception:
-            pass
+        self._stop_event.set()
+        if self.mode == 'loop':
+            os.write(self._wake_w, b'x')
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join()
+        with self._serial_lock:
+            self._close_serials()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.capture is not None:
+            self.capture.close()
+            logging.info(f"Captura guardada en {self.capture.path} ({self.capture.records} registros, "
+                         f"{self.capture.dropped} descartados)")
+        if self.mode == 'loop':
+            os.close(self._wake_r)
+            os.close(self._wake_w)
         logging.info("SerialBroker detenido.")
+        # Vacía a disco lo que quede en la cola
+        self._log_listener.stop()
+
+    # --- Procesamiento de líneas (común a ambos modos) ---
+
+    def _handle_pc_line(self, line, source=None):
+        """Procesa un comando de un cliente: responde y/o lo reenvía al Mega.
+
+        `source` es el endpoint del cliente en modo loop ('PC' en modo threads).
+        """
+        # El tráfico por línea va a DEBUG; formatearlo solo si se va a emitir
+        if traffic_log.isEnabledFor(logging.DEBUG):
+            traffic_log.debug("%s → %s", source, line.strip())
+        if self.capture is not None:
+            self.capture.record(CLIENT_TO_BROKER, getattr(source, 'channel', 0),
+                                line.encode('utf-8'))
+        self.metrics.inc('lines', source='client')
+        if not self.dispatcher.dispatch(line, source):
+            # Comando inválido
+            self.metrics.inc('parse_errors')
+            self._reply(source, b'ERR1:BadCmd\n')
+
+    def _on_heartbeat(self, args, line, source):
+        self._reply(source, b'c\n')
+
+    def _on_lease(self, args, line, source):
+        """L1 toma el lease de movimiento, L0 lo libera"""
+        (take,) = args
+        if take:
+            if not self.arbiter.acquire(source):
+                self._reply(source, b'ERR7:Leased\n')
+                return
+            logging.info(f"Lease de movimiento para {source}")
+        else:
+            self.arbiter.release(source)
+        self._reply(source, b'OK\n')
+
+    def _on_framing(self, args, line, source):
+        """B1 pasa al cliente a tramas binarias, B0 lo devuelve a ASCII"""
+        if self.mode != 'loop':
+            # El puerto PC del modo threads habla solo ASCII
+            self._reply(source, b'ERR1:BadCmd\n')
+            return
+        (enable,) = args
+        # Respuesta propia (no un OK suelto que pueda ser de otro comando);
+        # sale todavía en el formato anterior
+        self._reply(source, b'OK:B1\n' if enable else b'OK:B0\n')
+        if source.framed != enable:
+            source.framed = enable
+            logging.info(f"{source.name}: framing {'binario' if enable else 'ASCII'}")
+
+    def _on_move(self, args, line, source):
+        """M/A con unidades: convierte a pasos antes de reenviar"""
+        cmd, axis, val, unit = args
+        if not self.arbiter.may_move(source):
+            self._reply(source, b'ERR7:Leased\n')
+            return
+        if not self._check_room(source, cmd, axis):
+            return
+        # Los relativos arrastran el resto del redondeo: sin deriva acumulada
+        steps = self.converter.to_steps(axis, val, unit, relative=(cmd == 'M'))
+        self._ack(source)
+        self._send_mega(f"{cmd}{axis}{steps}\n".encode(), source, cmd)
+
+    def _on_status(self, args, line, source):
+        """S: contestar desde la caché; sin telemetría todavía, preguntar al Mega"""
+        framed = getattr(source, 'framed', False)
+        cached = self._cached_status()
+        # Con framing las respuestas llegan en orden: si el cliente espera
+        # otras, la caché adelantaría la de este S
+        if cached is None or (framed and self.arbiter.outstanding(source)):
+            self._on_forward(args, line, source)
+            return
+        self.metrics.inc('status_cache_hits')
+        if framed:
+            # Como el S del Mega: solo la telemetría
+            self._reply(source, cached)
+        else:
+            self._reply(source, b'OK\n' + cached)
+
+    def _cached_status(self):
+        """Última telemetría con su antigüedad: b'S:...' + b' age=<ms>\\n'"""
+        if not self.cache_enabled or self._telemetry_line is None:
+            return None
+        age_ms = int((time.monotonic() - self._telemetry_time) * 1000)
+        return b'%s age=%d\n' % (self._telemetry_line, age_ms)
+
+    def _poll_status(self):
+        """Consulta periódica del broker (una sola en vuelo, nunca con la cola llena)"""
+        if self.mode == 'loop' and self._mega_ep is None:
+            return
+        with self._outbox:
+            if not self.arbiter.outstanding(POLLER) and not self.arbiter.full():
+                self._send_mega(b'S\n', POLLER, 'S')
+
+    def _on_forward(self, args, line, source):
+        letter = line[0]
+        if letter in MOTION_LETTERS and not self.arbiter.may_move(source):
+            self._reply(source, b'ERR7:Leased\n')
+            return
+        if not self._check_room(source, letter):
+            return
+        if letter == 'H':
+            # El homing pone el eje en 0 exacto
+            self.converter.reset_remainder(args[0])
+        self._ack(source)
+        self._send_mega(line.encode(), source, letter)
+
+    def _handle_mega_line(self, raw):
+        """Procesa una línea del Mega y la reenvía al cliente que corresponda"""
+        if self.capture is not None:
+            self.capture.record(MEGA_TO_BROKER, 0, raw)
+        self.metrics.inc('lines', source='mega')
+        telemetry = is_telemetry(raw)
+        if telemetry:
+            if parse_telemetry(raw, self.telemetry):
+                self._telemetry_line = raw.rstrip()
+                self._telemetry_time = time.monotonic()
+            else:
+                self.metrics.inc('telemetry_parse_errors')
+            # Muestreada: 1 de cada `telemetry_sample` llega al archivo
+            telemetry_log.info("Mega → %s", LazyLine(raw))
+        else:
+            self._count_mega_line(raw)
+            if traffic_log.isEnabledFor(logging.DEBUG):
+                traffic_log.debug("Mega → %s", LazyLine(raw))
+        if self.mode != 'loop':
+            with self._outbox:
+                _, client = self.arbiter.route_reply(raw)
+                # Una respuesta libera crédito: puede salir el siguiente
+                self._pump_mega()
+                self._outbox.notify_all()
+            # Las respuestas a la consulta periódica se quedan en el broker;
+            # el resto se reenvía tal cual, sin decodificar/recodificar
+            if client is not POLLER:
+                if self.capture is not None:
+                    self.capture.record(BROKER_TO_CLIENT, 0, raw)
+                self.ser_pc.write(raw)
+            return
+        is_reply, client = self.arbiter.route_reply(raw)
+        if is_reply:
+            if client is not None and client is not POLLER:
+                self._send_client(client, raw)
+        elif client is POLLER:
+            # Respuesta a la consulta periódica: solo alimenta la caché
+            pass
+        else:
+            if self.capture is not None:
+                self.capture.record(BROKER_TO_CLIENT, BROADCAST, raw)
+            # Se codifica una sola vez para todos los clientes con framing
+            framed = None
+            for client in list(self._clients):
+                if client.framed:
+                    if framed is None:
+                        framed = encode_lines(raw)
+                    self._queue_write(client, framed)
+                else:
+                    self._queue_write(client, raw)
+        # Una respuesta libera crédito: puede salir el siguiente en turno
+        self._pump_mega()
+
+    def _ack(self, source):
+        """OK inmediato para clientes ASCII.
+
+        A un cliente con framing le llega el OK del Mega reenviado; uno más
+        del broker le daría dos OK por comando.
+        """
+        if not getattr(source, 'framed', False):
+            self._reply(source, b'OK\n')
+
+    def _reply(self, source, data):
+        if self.mode == 'loop':
+            self._send_client(source, data)
+        else:
+            if self.capture is not None:
+                self.capture.record(BROKER_TO_CLIENT, 0, data)
+            self.ser_pc.write(data)
+
+    def _send_client(self, endpoint, data):
+        """Líneas ASCII hacia un cliente, como tramas si negoció framing"""
+        if self.capture is not None and endpoint is not None:
+            self.capture.record(BROKER_TO_CLIENT, endpoint.channel, data)
+        if endpoint is not None and endpoint.framed:
+            data = encode_lines(data)
+        self._queue_write(endpoint, data)
+
+    # --- Métricas ---
+
+    def _register_gauges(self):
+        if self.mode == 'loop':
+            self.metrics.gauge('clients_connected', lambda: len(self._clients))
+            self.metrics.gauge('queued_commands', self.arbiter.queued)
+        handler = getattr(self._log_listener, 'queue_handler', None)
+        if handler is not None:
+            self.metrics.gauge('log_records_dropped', lambda: handler.dropped)
+        if self.capture is not None:
+            self.metrics.gauge('capture_records_dropped', lambda: self.capture.dropped)
+
+    def _on_command_finished(self, letter, elapsed, outcome):
+        """Callback del árbitro: un comando recibió su OK/ERR (o venció)"""
+        if outcome == 'timeout':
+            self.metrics.inc('replies_timed_out', cmd=letter)
+        else:
+            self.metrics.observe('ack' if outcome == 'ok' else 'error', letter, elapsed)
+
+    def _mark_sent(self, data, letter):
+        """Anota cuándo salió hacia el Mega un comando que termina en D<n>"""
+        self.metrics.inc('commands', cmd=letter)
+        if letter in DONE_LETTERS:
+            self._motion_sent[data[1] - 48] = (letter, time.monotonic())
 
-    def _convert_to_steps(self, axis, value, unit):
-        cfg = self.axes.get(str(axis))
-        if not cfg or 'steps_per_rev' not in cfg:
-            raise KeyError(f"Configuración del eje {axis} faltante en axes")
-        steps_per_rev = cfg['steps_per_rev']
-        gear = cfg.get('gear_ratio', 1)
-        if unit == 'G':
-            return int(round(value * steps_per_rev * gear / 360.0))
-        return value
+    def _count_mega_line(self, raw):
+        """D<n>/ENDSTOP<n> cierran la latencia 'done'; ERR<n> se cuenta por código"""
+        if raw[:1] == b'D' or raw[:7] == b'ENDSTOP':
+            digit = raw[1:2] if raw[:1] == b'D' else raw[7:8]
+            if digit and b'1' <= digit <= b'6':
+                sent = self._motion_sent[digit[0] - 48]
+                if sent is not None:
+                    self._motion_sent[digit[0] - 48] = None
+                    self.metrics.observe('done', sent[0], time.monotonic() - sent[1])
+        elif raw[:3] == b'ERR':
+            self.metrics.inc('mega_errors', code=raw[3:].strip().decode('ascii', 'ignore'))
+
+    # --- Cola hacia el Mega ---
+
+    def _check_room(self, source, letter, axis=None):
+        """¿Se acepta un comando más? Si no, contesta ERR8:Busy.
+
+        Con `block` siempre se acepta: quien espera es el lector del cliente.
+        """
+        if letter == 'E' or self.overflow == 'block':
+            return True
+        with self._outbox:
+            if not self.arbiter.full():
+                return True
+            if (self.overflow == 'coalesce' and letter == 'A'
+                    and self.arbiter.has_absolute(source, axis)):
+                return True
+        self.metrics.inc('commands_rejected', cmd=letter)
+        self._reply(source, b'ERR8:Busy\n')
+        return False
+
+    def _send_mega(self, data, source=None, letter=None):
+        with self._outbox:
+            if letter == 'E':
+                # La parada no espera turno, y lo que seguía en cola ya no debe moverse
+                dropped = self.arbiter.drop_motion()
+                if dropped:
+                    logging.warning(f"E: se descartan {dropped} comandos de movimiento en cola")
+                self.arbiter.sent_direct(source, data, letter)
+                self._mark_sent(data, letter)
+                self._write_mega(data)
+                return
+            if self.arbiter.full():
+                if self.overflow == 'coalesce' and self.arbiter.coalesce(source, data, letter):
+                    self.metrics.inc('commands_coalesced', cmd=letter)
+                    return
+                # Modo threads: el hilo del PC espera y el PC deja de ser leído
+                while (self.mode != 'loop' and self.arbiter.full()
+                       and not self._stop_event.is_set()):
+                    self._outbox.wait(0.5)
+            self.arbiter.enqueue(source, data, letter)
+            self._pump_mega()
+
+    def _pump_mega(self):
+        """Escribe al Mega los comandos en cola mientras haya crédito"""
+        if self.mode == 'loop' and self._mega_ep is None:
+            return
+        while True:
+            ready = self.arbiter.pop_ready()
+            if ready is None:
+                return
+            self._mark_sent(ready[1], ready[2])
+            self._write_mega(ready[1])
+
+    def _write_mega(self, data):
+        if self.capture is not None:
+            self.capture.record(BROKER_TO_MEGA, 0, data)
+        if self.mode == 'loop':
+            self._queue_write(self._mega_ep, data)
+        else:
+            self.ser_mega.write(data)
+
+    def _outbox_blocked(self):
+        return self.overflow == 'block' and self.arbiter.full()
+
+    # --- Modo threads: un hilo bloqueante por dirección ---
 
     def _read_pc_loop(self):
         """Lee comandos del PC, procesa y reenvía o responde"""
         while self.running:
+            gen = self._serial_gen
             try:
                 line = self.ser_pc.readline().decode('utf-8', errors='ignore')
                 if not line:
                     continue
-                logging.info(f"PC → {line.strip()}")
-
-                # Heartbeat
-                if line == 'C\n':
-                    self.ser_pc.write(b'c\n')
-                    continue
-
-                # M/A con unidades
-                m = self.cmd_regex.match(line)
-                if m:
-                    cmd, axis_str, val_str, unit = m.groups()
-                    axis, val = int(axis_str), int(val_str)
-                    unit = unit or 'S'
-                    steps = self._convert_to_steps(axis, val, unit)
-                    mega_cmd = f"{cmd}{axis}{steps}\n"
-                    self.ser_pc.write(b'OK\n')
-                    self.ser_mega.write(mega_cmd.encode())
-                    continue
-
-                # Otros comandos: H, S, E, K, P, T
-                if (self.homing_regex.match(line)
-                        or self.status_regex.match(line)
-                        or self.estop_regex.match(line)
-                        or self.kill_regex.match(line)
-                        or self.profile_regex.match(line)
-                        or self.timeout_regex.match(line)):
-                    self.ser_pc.write(b'OK\n')
-                    self.ser_mega.write(line.encode())
-                    continue
-
-                # Comando inválido
-                self.ser_pc.write(b'ERR1:BadCmd\n')
-            except serial.SerialException as e:
+                self._handle_pc_line(line, 'PC')
+            except (serial.SerialException, AttributeError) as e:
+                if not self.running:
+                    break
                 logging.error(f"SerialException en PC: {e}. Reabriendo puertos...")
-                self._open_serials()
+                self._open_serials(gen)
             except Exception as e:
                 logging.error(f"Error en lectura PC: {e}")
                 time.sleep(0.1)
@@ -152,18 +644,378 @@ class SerialBroker:
     def _read_mega_loop(self):
         """Lee respuestas del Mega y las reenvía al PC"""
         while self.running:
+            gen = self._serial_gen
             try:
-                line = self.ser_mega.readline().decode('utf-8', errors='ignore')
-                if line:
-                    logging.info(f"Mega → {line.strip()}")
-                    self.ser_pc.write(line.encode())
-            except serial.SerialException as e:
+                raw = self.ser_mega.readline()
+                if raw:
+                    self._handle_mega_line(raw)
+                with self._outbox:
+                    # readline() vuelve al menos cada `timeout` segundos
+                    self.arbiter.expire(time.monotonic())
+                    self._pump_mega()
+                    self._outbox.notify_all()
+            except (serial.SerialException, AttributeError) as e:
+                if not self.running:
+                    break
                 logging.error(f"SerialException en Mega: {e}. Reabriendo puertos...")
-                self._open_serials()
+                self._open_serials(gen)
             except Exception as e:
                 logging.error(f"Error en lectura Mega: {e}")
                 time.sleep(0.1)
 
+    def _poll_loop(self):
+        """Modo threads: consulta S al Mega a frecuencia fija"""
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self._poll_status()
+            except (serial.SerialException, AttributeError, OSError):
+                # El hilo lector del Mega se ocupa de reabrir el puerto
+                pass
+
+    # --- Modo loop: un solo hilo con selectors ---
+
+    def _run_loop(self):
+        """Atiende PC, Mega, clientes y la señal de parada desde un único select()"""
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._open_listeners()
+        self._attach_endpoints()
+        next_poll = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+                if self.poll_interval is not None and now >= next_poll:
+                    self._poll_status()
+                    # Sin acumular atrasos si el loop se demoró
+                    next_poll = max(next_poll + self.poll_interval, now)
+                # Despertar a tiempo para descartar respuestas que no llegaron
+                timeout = self.arbiter.expire(now)
+                if self.poll_interval is not None:
+                    until_poll = max(0.0, next_poll - now)
+                    timeout = until_poll if timeout is None else min(timeout, until_poll)
+                for key, mask in self._selector.select(timeout):
+                    endpoint = key.data
+                    if endpoint is None:
+                        # Self-pipe: stop() pidió terminar
+                        os.read(self._wake_r, 512)
+                        continue
+                    if isinstance(endpoint, _Listener):
+                        self._accept(endpoint)
+                        continue
+                    if endpoint.closed:
+                        continue
+                    try:
+                        if mask & selectors.EVENT_READ:
+                            self._loop_read(endpoint)
+                        if mask & selectors.EVENT_WRITE and not endpoint.closed:
+                            self._loop_flush(endpoint)
+                    except (OSError, serial.SerialException) as e:
+                        if self._stop_event.is_set():
+                            break
+                        if endpoint.kind == 'socket':
+                            self._drop_client(endpoint, e)
+                            continue
+                        logging.error(f"Error en puerto {endpoint.name}: {e}. Reabriendo puertos...")
+                        self._detach_endpoints()
+                        self._open_serials()
+                        self._attach_endpoints()
+                        # Las demás claves de este select() ya no son válidas
+                        break
+                # Un expire() pudo liberar crédito
+                self._pump_mega()
+                if self._paused and not self._outbox_blocked():
+                    self._resume_clients()
+        finally:
+            self._detach_endpoints()
+            for client in list(self._clients):
+                self._drop_client(client)
+            self._close_listeners()
+            self._selector.close()
+
+    def _attach_endpoints(self):
+        if self.ser_mega is None or (self.pc_port and self.ser_pc is None):
+            return
+        self.arbiter.reset()
+        self._mega_ep = _Endpoint('Mega', self.ser_mega, self._handle_mega_line, 'mega')
+        self._selector.register(self._mega_ep.fd, selectors.EVENT_READ, self._mega_ep)
+        if self.ser_pc is not None:
+            self._pc_ep = self._add_client('PC', self.ser_pc, 'pc')
+
+    def _detach_endpoints(self):
+        for endpoint in (self._pc_ep, self._mega_ep):
+            if endpoint is not None:
+                endpoint.closed = True
+                try:
+                    self._selector.unregister(endpoint.fd)
+                except (KeyError, ValueError):
+                    pass
+        if self._pc_ep is not None:
+            self._clients.remove(self._pc_ep)
+            if self._pc_ep in self._paused:
+                self._paused.remove(self._pc_ep)
+            self.arbiter.client_gone(self._pc_ep)
+        self._pc_ep = None
+        self._mega_ep = None
+
+    # --- Clientes por socket ---
+
+    def _open_listeners(self):
+        if self.tcp_address:
+            host, _, port = str(self.tcp_address).rpartition(':')
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host or '127.0.0.1', int(port)))
+            self._listen(sock, f"tcp {host or '127.0.0.1'}:{port}")
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                # Socket huérfano de una ejecución anterior
+                os.unlink(self.unix_path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(self.unix_path)
+            self._listen(sock, f"unix {self.unix_path}", self.unix_path)
+
+    def _listen(self, sock, label, path=None):
+        sock.listen(self.max_clients)
+        sock.setblocking(False)
+        listener = _Listener(sock, label, path)
+        self._listeners.append(listener)
+        self._selector.register(sock, selectors.EVENT_READ, listener)
+        logging.info(f"Aceptando clientes en {label}")
+
+    def _close_listeners(self):
+        for listener in self._listeners:
+            try:
+                self._selector.unregister(listener.sock)
+            except (KeyError, ValueError):
+                pass
+            listener.sock.close()
+            if listener.path and os.path.exists(listener.path):
+                os.unlink(listener.path)
+        self._listeners = []
+
+    def _accept(self, listener):
+        try:
+            conn, addr = listener.sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sockets = sum(1 for client in self._clients if client.kind == 'socket')
+        if sockets >= self.max_clients:
+            logging.warning(f"Cliente rechazado en {listener.label}: máximo {self.max_clients}")
+            conn.close()
+            return
+        conn.setblocking(False)
+        if conn.family != socket.AF_UNIX:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._client_seq += 1
+        name = f"cliente{self._client_seq}"
+        endpoint = self._add_client(name, conn, 'socket')
+        # 1..MAX_CHANNEL, cíclico: 0 es el puerto PC y BROADCAST la difusión
+        endpoint.channel = (self._client_seq - 1) % MAX_CHANNEL + 1
+        logging.info(f"{name} conectado por {listener.label} {addr or ''}".rstrip())
+
+    def _add_client(self, name, handle, kind):
+        endpoint = _Endpoint(name, handle, None, kind)
+        endpoint.on_line = lambda raw: self._handle_pc_line(
+            raw.decode('utf-8', errors='ignore'), endpoint)
+        self._clients.append(endpoint)
+        self._selector.register(endpoint.fd, selectors.EVENT_READ, endpoint)
+        return endpoint
+
+    def _drop_client(self, endpoint, reason=None):
+        if endpoint.closed:
+            return
+        endpoint.closed = True
+        try:
+            self._selector.unregister(endpoint.fd)
+        except (KeyError, ValueError):
+            pass
+        if endpoint in self._clients:
+            self._clients.remove(endpoint)
+        if endpoint in self._paused:
+            self._paused.remove(endpoint)
+        if self.arbiter.owner is endpoint:
+            logging.info(f"Lease de movimiento liberado: {endpoint.name} se desconectó")
+        self.arbiter.client_gone(endpoint)
+        if endpoint.kind == 'socket':
+            endpoint.handle.close()
+            if reason is not None:
+                logging.info(f"{endpoint.name} desconectado: {reason}")
+
+    def _loop_read(self, endpoint):
+        data = os.read(endpoint.fd, 4096)
+        if not data:
+            if endpoint.kind == 'socket':
+                self._drop_client(endpoint, "cerró la conexión")
+                return
+            # Igual que pyserial: listo para leer pero sin datos = desconectado
+            raise serial.SerialException(f"{endpoint.name} sin datos (¿desconectado?)")
+        endpoint.rbuf += data
+        if endpoint.paused:
+            self._scan_for_stop(endpoint)
+            # Pasado el tope deja de leerse: el cliente siente la contrapresión
+            self._update_events(endpoint)
+            return
+        self._drain_lines(endpoint)
+
+    def _scan_for_stop(self, endpoint):
+        """Cliente en pausa: un E en lo ya leído no espera su turno.
+
+        Los movimientos que el cliente envió antes del E se descartan igual
+        que los que estaban en la cola; el resto se conserva.
+        """
+        buf = endpoint.rbuf
+        units = []   # (bytes crudos, línea) de cada línea o trama completa
+        start = 0
+        while True:
+            unit = self._next_line(endpoint, buf, start)
+            if unit is None:
+                break
+            end, line = unit
+            units.append((buf[start:end], line))
+            start = end
+        lines = [line for _, line in units]
+        if b'E\n' not in lines:
+            return
+        last = len(lines) - 1 - lines[::-1].index(b'E\n')
+        kept = [raw for raw, line in units[:last]
+                if line is not None and line[:1].decode('latin-1') not in MOTION_LETTERS]
+        kept += [raw for raw, _ in units[last + 1:]]
+        endpoint.rbuf = bytearray(b''.join(kept) + buf[start:])
+        endpoint.on_line(b'E\n')
+
+    def _next_line(self, endpoint, buf, start):
+        """Siguiente línea completa de `buf` desde `start`: (fin, línea).
+
+        Con framing, la línea sale de decodificar una trama; `línea` es None
+        si la trama estaba corrupta y b'' si eran bytes sueltos. Devuelve
+        None si falta recibir más.
+        """
+        if not endpoint.framed:
+            end = buf.find(b'\n', start)
+            if end < 0:
+                return None
+            return end + 1, bytes(buf[start:end + 1])
+        result = read_frame(buf, start)
+        if result is None:
+            return None
+        frame_type, payload, end = result
+        if frame_type == T_NOISE:
+            return end, b''
+        if frame_type is None:
+            return end, None
+        try:
+            return end, decode_frame(frame_type, payload)
+        except FrameError:
+            return end, None
+
+    def _drain_lines(self, endpoint):
+        """Procesa las líneas completas del buffer de lectura del endpoint"""
+        buf = endpoint.rbuf
+        start = 0
+        while not endpoint.closed:
+            if endpoint.kind != 'mega' and self._outbox_blocked():
+                # Lo no procesado queda en rbuf; el cliente espera su turno
+                self._pause_client(endpoint)
+                break
+            unit = self._next_line(endpoint, buf, start)
+            if unit is None:
+                break
+            start, line = unit
+            if not line:
+                if line is None:
+                    # Trama corrupta: no llega al Mega, el cliente se entera
+                    self.metrics.inc('frame_errors')
+                    self._send_client(endpoint, b'ERR9:BadFrame\n')
+                continue
+            try:
+                endpoint.on_line(line)
+            except (OSError, serial.SerialException):
+                raise
+            except Exception as e:
+                logging.error(f"Error procesando línea de {endpoint.name}: {e}")
+        del buf[:start]
+        if endpoint.paused:
+            self._scan_for_stop(endpoint)
+        elif len(buf) > MAX_LINE_LENGTH:
+            logging.error(f"Línea demasiado larga de {endpoint.name}, descartada")
+            buf.clear()
+
+    def _queue_write(self, endpoint, data):
+        """Escribe sin bloquear; lo que no entra queda para EVENT_WRITE"""
+        if endpoint is None or endpoint.closed:
+            return
+        if not endpoint.wbuf:
+            try:
+                written = os.write(endpoint.fd, data)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                if endpoint.kind != 'socket':
+                    raise
+                # Un cliente caído no debe tumbar el reenvío a los demás
+                self._drop_client(endpoint, e)
+                return
+            if written == len(data):
+                return
+            data = data[written:]
+            endpoint.wbuf += data
+            self._update_events(endpoint)
+        else:
+            endpoint.wbuf += data
+        if endpoint.kind == 'socket' and len(endpoint.wbuf) > MAX_CLIENT_BACKLOG:
+            self._drop_client(endpoint, "no lee lo que se le envía")
+
+    def _loop_flush(self, endpoint):
+        try:
+            written = os.write(endpoint.fd, endpoint.wbuf)
+        except BlockingIOError:
+            return
+        del endpoint.wbuf[:written]
+        if not endpoint.wbuf:
+            self._update_events(endpoint)
+
+    def _update_events(self, endpoint):
+        """Registra en el selector lo que espera el endpoint: leer y/o escribir"""
+        events = selectors.EVENT_READ
+        if endpoint.paused and len(endpoint.rbuf) >= MAX_PAUSED_BUFFER:
+            events = 0
+        if endpoint.wbuf:
+            events |= selectors.EVENT_WRITE
+        try:
+            key = self._selector.get_key(endpoint.fd)
+        except KeyError:
+            key = None
+        if key is None:
+            if events:
+                self._selector.register(endpoint.fd, events, endpoint)
+        elif not events:
+            self._selector.unregister(endpoint.fd)
+        elif key.events != events:
+            self._selector.modify(endpoint.fd, events, endpoint)
+
+    def _pause_client(self, endpoint):
+        if endpoint.paused:
+            return
+        endpoint.paused = True
+        self._paused.append(endpoint)
+        self._update_events(endpoint)
+        self.metrics.inc('clients_paused')
+
+    def _resume_clients(self):
+        """Hay lugar en la cola: los clientes pausados vuelven a leerse, en orden"""
+        paused, self._paused = self._paused, []
+        for endpoint in paused:
+            if endpoint.closed:
+                continue
+            endpoint.paused = False
+            self._update_events(endpoint)
+            # Primero lo que ya estaba leído; puede volver a pausarlo
+            try:
+                self._drain_lines(endpoint)
+            except (OSError, serial.SerialException) as e:
+                # El próximo select() detecta el puerto caído y lo reabre
+                logging.error(f"Error reanudando a {endpoint.name}: {e}")
+
 if __name__ == '__main__':
     broker = SerialBroker('config.yaml')
     try:
@@ -0,0 +1,157 @@
+"""
+Logging del broker fuera del camino de reenvío.
+
+Los hilos del broker solo encolan registros (QueueHandler, sin bloquear: si la
+cola se llena el registro se descarta y se cuenta). Un QueueListener en su
+propio hilo los escribe a disco con rotación por tamaño o por tiempo y
+comprime con gzip los archivos rotados, así una tarjeta SD lenta nunca frena
+un comando.
+
+Loggers:
+ - raíz: eventos del broker (aperturas, errores...).
+ - `broker.traffic`: cada línea PC→Mega / Mega→PC, a nivel DEBUG. Se activa
+   con `traffic_level: DEBUG`.
+ - `broker.telemetry`: líneas de telemetría, muestreadas 1 de cada
+   `telemetry_sample` (0 = ninguna).
+
+Configuración (sección `logging` de config.yaml, todas opcionales):
+
+    logging:
+      file: logs/broker.log
+      level: INFO
+      traffic_level: INFO
+      telemetry_sample: 50
+      rotate: size          # size | time
+      max_bytes: 1048576
+      when: midnight        # solo con rotate: time
+      backup_count: 5
+      compress: true
+      queue_size: 10000
+"""
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+
+DEFAULTS = {
+    'file': 'logs/broker.log',
+    'level': 'INFO',
+    'traffic_level': 'INFO',
+    'telemetry_sample': 50,
+    'rotate': 'size',
+    'max_bytes': 1024 * 1024,
+    'when': 'midnight',
+    'backup_count': 5,
+    'compress': True,
+    'queue_size': 10000,
+}
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
+traffic_log = logging.getLogger('broker.traffic')
+telemetry_log = logging.getLogger('broker.telemetry')
+
+
+class LazyLine:
+    """Línea cruda que solo se decodifica si el registro llega a formatearse."""
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __str__(self):
+        return self.raw.decode('utf-8', errors='ignore').strip()
+
+
+class DropQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloquea: con la cola llena descarta y cuenta."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SampleFilter(logging.Filter):
+    """Deja pasar 1 de cada `every` registros (0 = ninguno)."""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._count = 0
+
+    def filter(self, record):
+        if self.every <= 0:
+            return False
+        self._count += 1
+        if self._count >= self.every:
+            self._count = 0
+            return True
+        return False
+
+
+def _gzip_namer(name):
+    return name + '.gz'
+
+
+def _gzip_rotator(source, dest):
+    """Comprime el archivo rotado (corre en el hilo del listener)."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _file_handler(cfg):
+    path = cfg['file']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if cfg['rotate'] == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=cfg['when'], backupCount=cfg['backup_count'], encoding='utf-8')
+    elif cfg['rotate'] == 'size':
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=cfg['max_bytes'], backupCount=cfg['backup_count'], encoding='utf-8')
+    else:
+        raise ValueError(f"logging.rotate inválido: {cfg['rotate']!r} (usar 'size' o 'time')")
+    if cfg['compress']:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def setup_logging(section=None):
+    """Configura el pipeline asíncrono y devuelve el QueueListener ya iniciado.
+
+    Llamar a `listener.stop()` al terminar vacía la cola a disco.
+    """
+    cfg = dict(DEFAULTS)
+    cfg.update(section or {})
+
+    log_queue = queue.Queue(maxsize=cfg['queue_size'])
+    queue_handler = DropQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(cfg['level'])
+
+    traffic_log.setLevel(cfg['traffic_level'])
+    telemetry_log.setLevel(logging.INFO)
+    for f in list(telemetry_log.filters):
+        telemetry_log.removeFilter(f)
+    telemetry_log.addFilter(SampleFilter(int(cfg['telemetry_sample'])))
+
+    listener = logging.handlers.QueueListener(
+        log_queue, _file_handler(cfg), respect_handler_level=True)
+    listener.start()
+    listener.queue_handler = queue_handler
+    return listener
@@ -0,0 +1,181 @@
+"""
+Captura binaria del tráfico del broker, para reproducirla después (replay.py).
+
+Formato (little endian, solo se agrega al final):
+
+    encabezado: b'BRZCAP1\\n' | inicio epoch (double) | inicio monotonic (uint64 ns)
+    registro:   t (uint64 ns desde el inicio) | dirección (uint8) | canal (uint8)
+                | largo (uint16) | bytes
+
+La dirección dice por qué borde pasó la línea (ver DIRECTIONS) y el canal qué
+cliente fue (0 = puerto PC o el Mega, 1-254 = clientes por socket, 255 =
+difusión a todos los clientes). Los canales de cliente se reusan en ciclo
+después del 254: nunca chocan con la difusión. Se graban las líneas ASCII
+tal como las procesa el broker, antes del framing binario.
+
+Configuración (sección `capture` de config.yaml):
+
+    capture:
+      enabled: false
+      dir: captures
+      queue_size: 10000
+
+Para inspeccionar una captura:
+
+    python capture.py captures/broker-20250101-120000.cap
+"""
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+MAGIC = b'BRZCAP1\n'
+HEADER = struct.Struct('<8sdQ')
+RECORD = struct.Struct('<QBBH')
+
+CLIENT_TO_BROKER = 0
+BROKER_TO_MEGA = 1
+MEGA_TO_BROKER = 2
+BROKER_TO_CLIENT = 3
+# Canal de las líneas difundidas a todos los clientes
+BROADCAST = 0xFF
+# Último canal de cliente; el broker los reparte 1..MAX_CHANNEL en ciclo
+MAX_CHANNEL = BROADCAST - 1
+DIRECTIONS = {
+    CLIENT_TO_BROKER: 'cliente→broker',
+    BROKER_TO_MEGA: 'broker→Mega',
+    MEGA_TO_BROKER: 'Mega→broker',
+    BROKER_TO_CLIENT: 'broker→cliente',
+}
+
+# Volcado a disco como mucho cada tanto (el resto queda en el buffer)
+FLUSH_INTERVAL = 1.0
+# Registros esperando al hilo escritor; con la cola llena se descartan
+QUEUE_SIZE = 10000
+
+
+class CaptureWriter:
+    """Graba registros en un archivo nuevo desde un hilo propio.
+
+    `record()` solo toma la marca de tiempo y encola: la escritura y el
+    volcado a disco quedan en el hilo escritor, como los logs (ver
+    broker_logging.py). Si la cola se llena el registro se descarta y se
+    cuenta en `dropped`.
+    """
+
+    def __init__(self, path, queue_size=QUEUE_SIZE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._file = open(path, 'xb', buffering=64 * 1024)
+        self._start_ns = time.monotonic_ns()
+        self._file.write(HEADER.pack(MAGIC, time.time(), self._start_ns))
+        self._queue = queue.Queue(queue_size)
+        # Marca y encolado juntos: los registros quedan en orden
+        self._lock = threading.Lock()
+        self._closed = False
+        self.records = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._writer, name='capture', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def in_directory(cls, directory, queue_size=QUEUE_SIZE):
+        """Captura nueva con la fecha y hora en el nombre."""
+        name = time.strftime('broker-%Y%m%d-%H%M%S.cap')
+        return cls(os.path.join(directory, name), queue_size)
+
+    def record(self, direction, channel, data):
+        # Un registro por línea: el largo entra en 16 bits
+        data = bytes(data[:0xFFFF])
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._queue.put_nowait(RECORD.pack(time.monotonic_ns() - self._start_ns,
+                                                   direction, channel, len(data)) + data)
+            except queue.Full:
+                self.dropped += 1
+
+    def _writer(self):
+        """Hilo escritor: vacía la cola al archivo y vuelca cada FLUSH_INTERVAL."""
+        next_flush = time.monotonic() + FLUSH_INTERVAL
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = b''
+            if item is None:
+                break
+            if item:
+                self._file.write(item)
+                self.records += 1
+            now = time.monotonic()
+            if now >= next_flush:
+                self._file.flush()
+                next_flush = now + FLUSH_INTERVAL
+        self._file.close()
+
+    def close(self):
+        """Escribe lo que queda en la cola y cierra el archivo."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # El marcador de fin espera lugar: lo encolado antes se escribe entero
+        self._queue.put(None)
+        self._thread.join()
+
+
+class CaptureReader:
+    """Lee una captura con mmap, sin copiarla a memoria."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path}: captura vacía o truncada")
+        magic, self.start_time, self.start_ns = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: no es una captura del broker")
+
+    def __iter__(self):
+        """Registros (t_ns, dirección, canal, bytes), en orden de grabación."""
+        buf = self._mmap
+        offset = HEADER.size
+        size = len(buf)
+        while offset + RECORD.size <= size:
+            t_ns, direction, channel, length = RECORD.unpack_from(buf, offset)
+            offset += RECORD.size
+            if offset + length > size:
+                # Último registro a medio escribir (el broker se cortó)
+                break
+            yield t_ns, direction, channel, buf[offset:offset + length]
+            offset += length
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _dump(path):
+    with CaptureReader(path) as reader:
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reader.start_time))
+        print(f"{path}: iniciada {started}")
+        for t_ns, direction, channel, data in reader:
+            text = data.decode('utf-8', errors='replace').rstrip('\n')
+            print(f"{t_ns / 1e9:12.6f} {DIRECTIONS.get(direction, direction):15s} "
+                  f"{channel:3d} {text}")
+
+
+if __name__ == '__main__':
+    import sys
+    for capture_path in sys.argv[1:]:
+        _dump(capture_path)
@@ -0,0 +1,216 @@
+"""
+Despacho de comandos del PC por tabla, indexada por la letra del comando.
+
+En lugar de probar una cadena de regex contra cada línea, el primer carácter
+elige directamente la entrada de la tabla. Cada entrada tiene un validador
+(devuelve los argumentos ya interpretados, o None si la línea es inválida) y
+un handler que recibe esos argumentos, la línea original y quién la envió.
+
+Uso:
+    dispatcher = CommandDispatcher()
+    dispatcher.register('H', handler, validate_axis)
+    if not dispatcher.dispatch('H1\\n', cliente):
+        ...  # comando inválido
+
+Ejecutar este módulo compara líneas/s contra la cadena de regex anterior:
+
+    python dispatch.py
+"""
+import re
+
+AXIS_DIGITS = frozenset('123456')
+# Líneas ya validadas que se recuerdan (S, C, H1... se repiten sin cesar)
+CACHE_SIZE = 256
+_DIGITS = frozenset('0123456789')
+
+
+# --- Validadores reutilizables (la línea llega con su '\n') ---
+
+def validate_bare(line):
+    """Comando de una sola letra: 'S\\n', 'E\\n', 'C\\n'."""
+    return () if len(line) == 2 and line[1] == '\n' else None
+
+
+def validate_axis(line):
+    """Letra + eje 1-6: 'H1\\n', 'K3\\n'. Devuelve (eje,)."""
+    if len(line) == 3 and line[2] == '\n' and line[1] in AXIS_DIGITS:
+        return (int(line[1]),)
+    return None
+
+
+def validate_switch(line):
+    """Letra + 0/1: 'L1\\n'. Devuelve (bool,)."""
+    if len(line) == 3 and line[2] == '\n' and line[1] in '01':
+        return (line[1] == '1',)
+    return None
+
+
+def validate_number(line):
+    """Letra + entero sin signo: 'T12\\n'. Devuelve (valor,)."""
+    body = line[1:-1]
+    if line[-1:] == '\n' and body and _DIGITS.issuperset(body):
+        return (int(body),)
+    return None
+
+
+def validate_profile(line):
+    """'PV<n>\\n' / 'PA<n>\\n'. Devuelve (parámetro, valor)."""
+    body = line[2:-1]
+    if (len(line) > 3 and line[1] in 'VA' and line[-1] == '\n'
+            and _DIGITS.issuperset(body)):
+        return (line[1], int(body))
+    return None
+
+
+def validate_axis_profile(line):
+    """'Q<eje><V|A><n>[.<d>]\\n'. Devuelve (eje, parámetro, valor)."""
+    if len(line) < 5 or line[-1] != '\n' or line[1] not in AXIS_DIGITS or line[2] not in 'VA':
+        return None
+    whole, _, frac = line[3:-1].partition('.')
+    if not whole or not _DIGITS.issuperset(whole) or not _DIGITS.issuperset(frac):
+        return None
+    return (int(line[1]), line[2], float(line[3:-1]))
+
+
+def validate_move(line):
+    """'<M|A><eje><±valor>[S|G|R]\\n'. Devuelve (letra, eje, valor, unidad).
+
+    Pasos (S o sin unidad) son enteros; grados (G) y radianes (R) admiten
+    decimales: 'M145.5G', 'A2-0.25R'.
+    """
+    if len(line) < 4 or line[-1] != '\n' or line[1] not in AXIS_DIGITS:
+        return None
+    end = len(line) - 1
+    unit = 'S'
+    if line[end - 1] in 'SGR':
+        unit = line[end - 1]
+        end -= 1
+    start = 3 if line[2] in '+-' else 2
+    digits = line[start:end]
+    if unit != 'S':
+        # Un único punto decimal, con al menos un dígito
+        whole, _, frac = digits.partition('.')
+        if not (whole or frac) or not _DIGITS.issuperset(whole) or not _DIGITS.issuperset(frac):
+            return None
+        return (line[0], int(line[1]), float(line[2:end]), unit)
+    if not digits or not _DIGITS.issuperset(digits):
+        return None
+    return (line[0], int(line[1]), int(line[2:end]), unit)
+
+
+class CommandDispatcher:
+    """Tabla letra → (validador, handler)."""
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self._table = {}
+        # línea → (handler, args) de líneas válidas ya vistas
+        self._cache = {}
+        self._cache_size = cache_size
+
+    def register(self, letter, handler, validator=validate_bare):
+        """Registra `handler(args, line, source)` para las líneas que empiezan con `letter`.
+
+        `validator(line)` devuelve una tupla de argumentos o None si la línea
+        no es válida. Registrar de nuevo la misma letra reemplaza la entrada.
+        """
+        if len(letter) != 1:
+            raise ValueError(f"La clave debe ser un solo carácter: {letter!r}")
+        self._table[letter] = (validator, handler)
+        self._cache.clear()
+
+    def unregister(self, letter):
+        self._table.pop(letter, None)
+        self._cache.clear()
+
+    def letters(self):
+        return sorted(self._table)
+
+    def dispatch(self, line, source=None):
+        """Ejecuta el handler de la línea. Devuelve False si es inválida.
+
+        `source` identifica al remitente y se pasa tal cual al handler.
+        """
+        hit = self._cache.get(line)
+        if hit is not None:
+            hit[0](hit[1], line, source)
+            return True
+        entry = self._table.get(line[:1])
+        if entry is None:
+            return False
+        args = entry[0](line)
+        if args is None:
+            return False
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[line] = (entry[1], args)
+        entry[1](args, line, source)
+        return True
+
+
+# --- Microbenchmark contra la cadena de regex anterior ---
+
+class _LegacyRegexChain:
+    """Clasificación de SerialBroker antes de la tabla (línea base)."""
+
+    def __init__(self):
+        self.cmd_regex = re.compile(r'^([MA])([1-6])([+-]?\d+)([GS])?\n$')
+        self.homing_regex = re.compile(r'^(H[1-6])\n$')
+        self.status_regex = re.compile(r'^(S)\n$')
+        self.estop_regex = re.compile(r'^(E)\n$')
+        self.kill_regex = re.compile(r'^(K[1-6])\n$')
+        self.profile_regex = re.compile(r'^(P[VA]\d+)\n$')
+        self.timeout_regex = re.compile(r'^(T\d+)\n$')
+
+    def classify(self, line):
+        if line == 'C\n':
+            return 'C'
+        m = self.cmd_regex.match(line)
+        if m:
+            cmd, axis_str, val_str, unit = m.groups()
+            return (cmd, int(axis_str), int(val_str), unit or 'S')
+        if (self.homing_regex.match(line)
+                or self.status_regex.match(line)
+                or self.estop_regex.match(line)
+                or self.kill_regex.match(line)
+                or self.profile_regex.match(line)
+                or self.timeout_regex.match(line)):
+            return line
+        return None
+
+
+def _benchmark(number=200000):
+    import timeit
+
+    # Mezcla típica: telemetría y heartbeats dominan, luego movimientos
+    lines = ['S\n', 'C\n', 'M190G\n', 'A1-2000\n', 'S\n', 'C\n', 'H3\n',
+             'PV1200\n', 'K2\n', 'E\n', 'T1\n', 'X\n']
+
+    legacy = _LegacyRegexChain()
+    dispatcher = CommandDispatcher()
+    noop = lambda args, line, source: None
+    dispatcher.register('C', noop)
+    dispatcher.register('S', noop)
+    dispatcher.register('E', noop)
+    dispatcher.register('M', noop, validate_move)
+    dispatcher.register('A', noop, validate_move)
+    dispatcher.register('H', noop, validate_axis)
+    dispatcher.register('K', noop, validate_axis)
+    dispatcher.register('P', noop, validate_profile)
+    dispatcher.register('T', noop, validate_number)
+
+    def run_legacy():
+        for line in lines:
+            legacy.classify(line)
+
+    def run_table():
+        for line in lines:
+            dispatcher.dispatch(line)
+
+    # 115200 baud 8N1 = 11520 bytes/s; con líneas de ~4 bytes, ~2900 líneas/s
+    for name, func in (("cadena de regex", run_legacy), ("tabla por letra", run_table)):
+        seconds = min(timeit.repeat(func, number=number // len(lines), repeat=3))
+        print(f"{name:18s} {number / seconds:12,.0f} líneas/s")
+
+
+if __name__ == '__main__':
+    _benchmark()
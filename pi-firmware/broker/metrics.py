@@ -0,0 +1,206 @@
+"""
+Métricas del broker: latencias por comando, contadores y endpoint HTTP.
+
+Latencias (histogramas log-lineales al estilo HDR, 16 sub-buckets por octava
+en microsegundos, ~6% de error relativo, memoria fija):
+ - `ack`: desde que el comando sale hacia el Mega hasta su OK.
+ - `error`: lo mismo, para los comandos que terminan en ERR<n>.
+ - `done`: desde que sale un M/A/K hasta el D<n>/ENDSTOP<n> de ese eje.
+
+Contadores: líneas por origen (cliente o Mega), comandos enviados al Mega,
+errores de parseo, errores del Mega por código, respuestas vencidas,
+reconexiones y S servidos desde la caché. Los registros de log y de captura
+descartados se exponen como gauges.
+
+`MetricsServer` expone todo en formato de texto de Prometheus:
+
+    curl http://127.0.0.1:9108/metrics
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Octavas cubiertas: hasta 2^32 µs (~71 min); lo que exceda cae en la última
+MAX_SHIFT = 28
+BUCKET_COUNT = (MAX_SHIFT + 2) * SUB_BUCKETS
+# Límites `le` exportados: potencias de 2 entre 32 µs y ~33 s
+EXPORT_BOUNDS_US = [1 << k for k in range(5, 26)]
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _bucket_index(us):
+    if us < 2 * SUB_BUCKETS:
+        return us
+    shift = us.bit_length() - (SUB_BUCKET_BITS + 1)
+    index = (shift + 1) * SUB_BUCKETS + (us >> shift) - SUB_BUCKETS
+    return min(index, BUCKET_COUNT - 1)
+
+
+def _bucket_upper(index):
+    """Mayor valor (µs) que cae en el bucket `index`."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Histograma de latencias en µs con cubetas de tamaño relativo fijo."""
+
+    __slots__ = ('counts', 'count', 'total_us', 'max_us')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, seconds):
+        us = max(0, int(seconds * 1e6))
+        self.counts[_bucket_index(us)] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, q):
+        """Valor (µs) por debajo del cual queda la fracción `q` de las muestras."""
+        if not self.count:
+            return 0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(_bucket_upper(index), self.max_us)
+        return self.max_us
+
+    def cumulative(self, bounds_us):
+        """Cantidad de muestras <= cada límite (alineados a octavas)."""
+        result = []
+        index = 0
+        seen = 0
+        for bound in bounds_us:
+            while index < BUCKET_COUNT and _bucket_upper(index) < bound:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class BrokerMetrics:
+    """Estado de métricas compartido entre el loop del broker y el HTTP."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}    # (etapa, comando) → LatencyHistogram
+        self.counters = {}   # (nombre, (etiquetas...)) → valor
+        self.gauges = {}     # nombre → función sin argumentos
+
+    def observe(self, stage, cmd, seconds):
+        with self._lock:
+            hist = self.latency.get((stage, cmd))
+            if hist is None:
+                hist = self.latency[(stage, cmd)] = LatencyHistogram()
+            hist.record(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, func):
+        """Registra un gauge que se evalúa al exportar."""
+        self.gauges[name] = func
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus."""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            # Resúmenes para no formatear con el lock tomado
+            latency = [(key, h.count, h.total_us, h.max_us,
+                        [h.percentile(q) for q in QUANTILES],
+                        h.cumulative(EXPORT_BOUNDS_US))
+                       for key, h in sorted(self.latency.items())]
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"broker_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+        for name, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            lines.append(f"# TYPE broker_{name} gauge")
+            lines.append(f"broker_{name} {value}")
+
+        if latency:
+            lines.append("# TYPE broker_command_latency_seconds histogram")
+        for (stage, cmd), count, total_us, _, _, cumulative in latency:
+            base = (('stage', stage), ('cmd', cmd))
+            for bound, n in zip(EXPORT_BOUNDS_US, cumulative):
+                lines.append(f"broker_command_latency_seconds_bucket"
+                             f"{_labels(base + (('le', f'{bound / 1e6:g}'),))} {n}")
+            lines.append(f"broker_command_latency_seconds_bucket{_labels(base + (('le', '+Inf'),))} {count}")
+            lines.append(f"broker_command_latency_seconds_sum{_labels(base)} {total_us / 1e6:.6f}")
+            lines.append(f"broker_command_latency_seconds_count{_labels(base)} {count}")
+
+        if latency:
+            lines.append("# TYPE broker_command_latency_quantile_seconds gauge")
+        for (stage, cmd), _, _, max_us, quantiles, _ in latency:
+            base = (('stage', stage), ('cmd', cmd))
+            for q, us in zip(QUANTILES, quantiles):
+                lines.append(f"broker_command_latency_quantile_seconds"
+                             f"{_labels(base + (('quantile', str(q)),))} {us / 1e6:.6f}")
+            lines.append(f"broker_command_latency_quantile_seconds"
+                         f"{_labels(base + (('quantile', '1'),))} {max_us / 1e6:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class MetricsServer:
+    """Servidor HTTP local (hilo daemon) que sirve /metrics."""
+
+    def __init__(self, metrics, address):
+        host, _, port = str(address).rpartition(':')
+        metrics_ref = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Sin ruido en stderr por cada scrape
+                pass
+
+        self.httpd = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,179 @@
+"""
+Reproduce una captura del broker (capture.py) sobre puertos serie virtuales.
+
+Crea pares pty y reinyecta las líneas grabadas respetando sus tiempos
+(multiplicados por `--speed`), haciendo de Mega, de PC o de ambos:
+
+ - `--role mega`: lo que el Mega envió. Se prueba un broker (con
+   `ports.mega` apuntando al pty) o un cliente conectado directo.
+ - `--role pc`: lo que envió el cliente del canal `--channel`. Se prueba un
+   broker con `ports.pc` apuntando al pty.
+ - `--role both`: ambos lados, para reproducir un incidente completo.
+
+Al terminar compara lo que se recibió en cada pty con lo que el broker
+había enviado en la captura.
+
+Ejemplo (config.yaml del broker con mega: /tmp/mega-replay):
+
+    python replay.py captures/broker-20250101-120000.cap --link-mega /tmp/mega-replay --speed 4
+"""
+import argparse
+import os
+import pty
+import select
+import time
+import tty
+
+from capture import (
+    CaptureReader, BROADCAST, CLIENT_TO_BROKER, BROKER_TO_MEGA,
+    MEGA_TO_BROKER, BROKER_TO_CLIENT
+)
+
+
+class _VirtualPort:
+    """Extremo maestro de un pty, con un symlink opcional al esclavo."""
+
+    def __init__(self, label, link=None):
+        self.label = label
+        self.master, self._slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self._slave)
+        os.set_blocking(self.master, False)
+        self.path = os.ttyname(self._slave)
+        self.link = link
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.path, link)
+        self.received = bytearray()
+        self.sent = 0
+
+    def write(self, data):
+        # El pty de un lado que no lee termina llenándose: se reintenta
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self.master, view):]
+            except BlockingIOError:
+                select.select([], [self.master], [], 0.1)
+        self.sent += 1
+
+    def read(self):
+        try:
+            self.received += os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            # EIO: el otro lado todavía no abrió (o ya cerró) el esclavo
+            pass
+
+    def close(self):
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master)
+        os.close(self._slave)
+
+
+def load_schedule(reader, role, channel):
+    """Líneas a inyectar y líneas esperadas por pty, según el rol."""
+    schedule = []    # (t_ns, etiqueta, datos)
+    expected = {'mega': [], 'pc': []}
+    for t_ns, direction, record_channel, data in reader:
+        data = bytes(data)
+        if direction == MEGA_TO_BROKER and role in ('mega', 'both'):
+            schedule.append((t_ns, 'mega', data))
+        elif direction == CLIENT_TO_BROKER and record_channel == channel and role in ('pc', 'both'):
+            schedule.append((t_ns, 'pc', data))
+        elif direction == BROKER_TO_MEGA:
+            expected['mega'].extend(data.splitlines())
+        elif direction == BROKER_TO_CLIENT and record_channel in (channel, BROADCAST):
+            expected['pc'].extend(data.splitlines())
+    if schedule:
+        # Empieza con la primera línea, sin el silencio previo de la captura
+        origin = schedule[0][0]
+        schedule = [(t_ns - origin, label, data) for t_ns, label, data in schedule]
+    return schedule, expected
+
+
+def replay(schedule, ports, speed, tail):
+    """Inyecta cada línea a su tiempo (escalado) mientras lee las respuestas."""
+    masters = {port.master: port for port in ports.values()}
+    start = time.monotonic()
+    index = 0
+    deadline = None
+    while True:
+        now = time.monotonic()
+        while index < len(schedule) and start + schedule[index][0] / 1e9 / speed <= now:
+            _, label, data = schedule[index]
+            ports[label].write(data)
+            index += 1
+        if index >= len(schedule):
+            # Unos instantes más para recibir las últimas respuestas
+            if deadline is None:
+                deadline = now + tail
+            elif now >= deadline:
+                return
+            timeout = deadline - now
+        else:
+            timeout = max(0.0, start + schedule[index][0] / 1e9 / speed - now)
+        readable, _, _ = select.select(list(masters), [], [], min(timeout, 0.5))
+        for fd in readable:
+            masters[fd].read()
+
+
+def report(ports, expected):
+    for label, port in ports.items():
+        received = bytes(port.received).splitlines()
+        wanted = expected[label]
+        print(f"{port.label}: {port.sent} líneas enviadas, {len(received)} recibidas "
+              f"(la captura tiene {len(wanted)})")
+        for index, (got, want) in enumerate(zip(received, wanted)):
+            if got != want:
+                print(f"  primera diferencia en la línea {index + 1}: "
+                      f"recibido {got!r}, capturado {want!r}")
+                break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce una captura del broker en puertos virtuales")
+    parser.add_argument('capture', help="archivo .cap grabado por el broker")
+    parser.add_argument('--role', choices=('mega', 'pc', 'both'), default='mega',
+                        help="qué lado de la captura se reproduce (por defecto: mega)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="factor de velocidad: 1 = tiempo real, 4 = cuatro veces más rápido")
+    parser.add_argument('--channel', type=int, default=0,
+                        help="cliente cuyos comandos se reproducen con --role pc/both (0 = puerto PC)")
+    parser.add_argument('--link-mega', help="symlink al pty que hace de Mega")
+    parser.add_argument('--link-pc', help="symlink al pty que hace de PC")
+    parser.add_argument('--delay', type=float, default=2.0,
+                        help="segundos de espera para que el programa bajo prueba abra los puertos")
+    parser.add_argument('--tail', type=float, default=1.0,
+                        help="segundos de lectura después de la última línea")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed debe ser mayor que 0")
+
+    with CaptureReader(args.capture) as reader:
+        schedule, expected = load_schedule(reader, args.role, args.channel)
+
+    ports = {}
+    if args.role in ('mega', 'both'):
+        ports['mega'] = _VirtualPort('Mega', args.link_mega)
+    if args.role in ('pc', 'both'):
+        ports['pc'] = _VirtualPort('PC', args.link_pc)
+    try:
+        for port in ports.values():
+            print(f"{port.label}: {port.link or port.path}")
+        duration = schedule[-1][0] / 1e9 / args.speed if schedule else 0.0
+        print(f"{len(schedule)} líneas, {duration:.1f} s a {args.speed:g}x. "
+              f"Comienza en {args.delay:g} s...")
+        time.sleep(args.delay)
+        replay(schedule, ports, args.speed, args.tail)
+        report(ports, expected)
+    except KeyboardInterrupt:
+        print("\nReproducción interrumpida")
+    finally:
+        for port in ports.values():
+            port.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Command Coalescer - Latest-wins, rate-limited absolute targets per axis.
+
+Slider drags produce far more targets than the Mega can usefully follow.
+The coalescer keeps only the newest target per axis, sends it at most
+``max_rate_hz`` times per second and never stacks a new target for an axis
+whose previous command is still unacknowledged. Superseded targets are
+dropped before they reach the wire, and so are unsent targets when the
+link drops: a reconnect never replays an old drag.
+"""
+import threading
+import time
+
+from config import SLIDER_STREAM_RATE_HZ
+from robot_events import ConnectionChanged
+
+
+class AxisCommandCoalescer:
+    """Per-axis latest-wins queue in front of RobotClient absolute moves."""
+
+    def __init__(self, client, max_rate_hz=SLIDER_STREAM_RATE_HZ):
+        self.client = client
+        self.interval = 1.0 / max_rate_hz if max_rate_hz > 0 else 0.0
+        self.sent = 0
+        self.dropped = 0
+        self._latest = {}       # axis -> newest target not yet sent
+        self._last_time = {}    # axis -> monotonic time of the last write
+        self._inflight = {}     # axis -> Future of that write
+        self._cond = threading.Condition()
+        self._running = True
+        self._unsubscribe = client.events.subscribe(ConnectionChanged, self._on_connection)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, axis_idx, target):
+        """Queue ``target`` for an axis, replacing any target not sent yet."""
+        with self._cond:
+            if axis_idx in self._latest:
+                self.dropped += 1
+            self._latest[axis_idx] = target
+            self._cond.notify()
+
+    def cancel(self, axis_idx=None):
+        """Forget unsent targets (all axes if ``axis_idx`` is None)."""
+        with self._cond:
+            if axis_idx is None:
+                self._latest.clear()
+            else:
+                self._latest.pop(axis_idx, None)
+
+    def close(self):
+        """Drop unsent targets and stop the worker thread."""
+        self._unsubscribe()
+        with self._cond:
+            self._running = False
+            self._latest.clear()
+            self._cond.notify()
+        self._thread.join(timeout=1)
+
+    def _on_connection(self, event):
+        """Disconnected: no pending target may go out after the user left."""
+        if event.connected:
+            return
+        with self._cond:
+            self._latest.clear()
+            self._inflight.clear()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                ready, wait = self._take_ready()
+                if not ready:
+                    self._cond.wait(wait)
+                    continue
+            for axis, target in ready:
+                self._send(axis, target)
+
+    def _take_ready(self):
+        """Pop targets that may go out now; else return the time to wait."""
+        now = time.monotonic()
+        ready = []
+        wait = None
+        for axis, target in list(self._latest.items()):
+            inflight = self._inflight.get(axis)
+            if inflight is not None and not inflight.done():
+                # Re-checked when the reply arrives (see _send)
+                continue
+            due = self._last_time.get(axis, 0.0) + self.interval
+            if due <= now:
+                ready.append((axis, target))
+                del self._latest[axis]
+            else:
+                wait = due - now if wait is None else min(wait, due - now)
+        return ready, wait
+
+    def _send(self, axis, target):
+        future = self.client.send_command_async(f"A{axis+1}{int(round(target))}")
+        with self._cond:
+            self._last_time[axis] = time.monotonic()
+            self._inflight[axis] = future
+            self.sent += 1
+        if future is not None:
+            future.add_done_callback(self._on_reply)
+
+    def _on_reply(self, future):
+        with self._cond:
+            self._cond.notify()
@@ -1,11 +1,46 @@
 """
 Application configuration constants.
 """
+import os
 
 # Serial Communication
 SERIAL_PORT = '/dev/ttyACM0'
 BAUD_RATE = 115200
 
+# Connect: give up if no valid telemetry arrives within READY_TIMEOUT seconds
+# (covers the bootloader delay when opening the port did reset the board),
+# probing with "S" every READY_PROBE_INTERVAL seconds
+READY_TIMEOUT = 4.0
+READY_PROBE_INTERVAL = 0.1
+
+# Seconds to wait for the Mega to answer a command
+RESPONSE_TIMEOUT = 1.0
+# Homing blocks the Mega until the endstop is hit (HOMING_TIMEOUT_MS = 20 s)
+HOMING_RESPONSE_TIMEOUT = 25.0
+
+# Reopen the port automatically after a USB dropout, retrying with
+# exponential backoff between these bounds (seconds)
+AUTO_RECONNECT = True
+RECONNECT_BACKOFF_MIN = 0.05
+RECONNECT_BACKOFF_MAX = 2.0
+
+# Port discovery: /dev is watched with inotify on Linux; elsewhere (or if
+# inotify is unavailable) the port list is rescanned every PORT_POLL_INTERVAL
+# seconds. PORT_SETTLE_DELAY lets udev finish creating a new node.
+PORT_POLL_INTERVAL = 2.0
+PORT_SETTLE_DELAY = 0.2
+
+# Pipelining: commands allowed in flight before waiting for their replies.
+# 1 = strict stop-and-wait.
+PIPELINE_WINDOW = 8
+# Arduino Mega hardware serial RX buffer (bytes)
+MEGA_RX_BUFFER_SIZE = 64
+
+# When connected through the broker, ask it for the binary framed protocol
+# (length + CRC16 per message, see framing.py). Falls back to ASCII if the
+# other end does not support it.
+BROKER_FRAMING = False
+
 # Window Settings
 WINDOW_WIDTH = 480
 WINDOW_HEIGHT = 320
@@ -26,8 +61,14 @@ MAX_ACCEL = 1000
 # Step size for jog buttons
 JOG_STEP_SIZE = 100
 
-# Status polling interval (seconds)
+# Maximum rate (per axis) at which slider targets are streamed while dragging
+SLIDER_STREAM_RATE_HZ = 10
+
+# Status polling interval (seconds) while any axis is moving
 STATUS_POLL_INTERVAL = 0.2
+# Status polling interval (seconds) while idle. Motion completion and
+# endstop hits are pushed by the Mega and trigger an immediate refresh.
+STATUS_IDLE_POLL_INTERVAL = 2.0
 
 # Predefined Tests
 PREDEFINED_TESTS = [
@@ -35,3 +76,31 @@ PREDEFINED_TESTS = [
     ("Test 2: Circle", 2),
     ("Test 3: Pick & Place", 3),
 ]
+
+# Saved paths: point lists kept in memory (LRU), and rows shown per page
+# in the Paths tab
+PATH_CACHE_SIZE = 32
+PATHS_PAGE_SIZE = 50
+
+# Path execution: poses prepared ahead of the one the arm is moving to
+PATH_LOOKAHEAD = 8
+# Plan each path so all axes start and finish every segment together
+# (trajectory_planner); PATH_PROFILE is "trapezoid" or "s-curve", the
+# latter limited by PATH_MAX_JERK (steps/s³)
+PATH_SYNCHRONIZED = True
+PATH_PROFILE = "trapezoid"
+PATH_MAX_JERK = 2000
+
+# Path simplification (path_simplifier): drop recorded points that lie
+# within PATH_SIMPLIFY_TOLERANCE of the line between their neighbours.
+# The unit is "S" (steps), "G" (degrees) or "R" (radians); G and R use
+# the axes of AXES_CONFIG_FILE. Off by default: with PATH_AUTO_SIMPLIFY,
+# paths are simplified when saved and the dropped points are not kept.
+PATH_AUTO_SIMPLIFY = False
+PATH_SIMPLIFY_TOLERANCE = 2
+PATH_SIMPLIFY_UNIT = "S"
+
+# Axis gearing (steps_per_rev, gear_ratio) lives only in the `axes`
+# section of the broker's config.yaml; the app reads it from there
+AXES_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "broker", "config.yaml")
@@ -0,0 +1,67 @@
+"""
+Flow Control - Credit window for pipelining commands to the Arduino Mega.
+
+The Mega reads one line per loop() iteration, between updateMotors() calls,
+so command bytes wait in its 64-byte hardware RX buffer until parseLine()
+answers them. A command's bytes are only known to be consumed once its reply
+(OK, ERR<n> or the telemetry line) comes back, so that reply is what returns
+the credit.
+"""
+import threading
+import time
+
+from config import PIPELINE_WINDOW, MEGA_RX_BUFFER_SIZE
+
+
+class CreditWindow:
+    """Bounds commands in flight by count and by unacknowledged bytes."""
+
+    def __init__(self, max_in_flight=PIPELINE_WINDOW, buffer_size=MEGA_RX_BUFFER_SIZE):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.buffer_size = buffer_size
+        self.in_flight = 0
+        self.outstanding_bytes = 0
+        self._cond = threading.Condition()
+
+    def _fits(self, nbytes):
+        if self.in_flight == 0:
+            # A lone command always goes out, even if it is oversized
+            return True
+        return (self.in_flight < self.max_in_flight
+                and self.outstanding_bytes + nbytes <= self.buffer_size)
+
+    def try_acquire(self, nbytes):
+        """Take credit for ``nbytes`` without blocking. Returns True on success."""
+        with self._cond:
+            if not self._fits(nbytes):
+                return False
+            self.in_flight += 1
+            self.outstanding_bytes += nbytes
+            return True
+
+    def acquire(self, nbytes, timeout=None):
+        """Block until ``nbytes`` fit in the window. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._fits(nbytes):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            self.outstanding_bytes += nbytes
+            return True
+
+    def release(self, nbytes):
+        """Return the credit of one acknowledged command."""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.outstanding_bytes = max(0, self.outstanding_bytes - nbytes)
+            self._cond.notify_all()
+
+    def reset(self):
+        """Forget everything in flight (e.g. after the link was reopened)."""
+        with self._cond:
+            self.in_flight = 0
+            self.outstanding_bytes = 0
+            self._cond.notify_all()
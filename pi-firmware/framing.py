@@ -0,0 +1,375 @@
+"""
+Framing - Compact binary framing for the PC <-> broker link.
+
+Every ASCII line of the protocol maps to one frame and back, so the broker
+only translates at the edge and everything behind it keeps speaking ASCII:
+
+    0xA5 | LEN | TYPE | payload (LEN bytes) | CRC16 (big endian)
+
+The CRC is CRC-16/CCITT-FALSE (binascii.crc_hqx) over LEN, TYPE and the
+payload. A frame whose CRC does not match is dropped and the reader resyncs
+on the next 0xA5, so a corrupted command never reaches motion control.
+
+Frame types:
+    LINE       any ASCII line, verbatim (fallback)
+    MOVE       M/A: flags (bit 7 absolute, bits 4-6 axis, bits 0-1 unit),
+               decimals byte for G/R, zigzag varint of the digits
+    TELEMETRY  "S:..." fields as zigzag varints, optional " age=<ms>"
+    OK         "OK"
+    ERR        code byte + optional text ("ERR8:Busy")
+    DONE       axis byte ("D3")
+    ENDSTOP    axis byte ("ENDSTOP3")
+
+A client turns framing on by sending the ASCII line "B1"; the broker answers
+"OK:B1" in ASCII and frames everything after that in both directions. A
+framed client gets only the Mega's OK for each command, not the broker's
+immediate one.
+
+Run this module directly for a bytes-per-message and throughput benchmark
+against plain ASCII:
+
+    python framing.py
+"""
+import binascii
+import struct
+import time
+
+SYNC = 0xA5
+HEADER_SIZE = 3
+CRC_SIZE = 2
+MAX_PAYLOAD = 255
+# Line that asks the broker to switch a client to frames
+NEGOTIATE = b"B1\n"
+NEGOTIATE_OK = b"OK:B1"
+
+T_NOISE = 0x00
+T_LINE = 0x01
+T_MOVE = 0x02
+T_TELEMETRY = 0x03
+T_OK = 0x04
+T_ERR = 0x05
+T_DONE = 0x06
+T_ENDSTOP = 0x07
+
+_UNITS = "SGR"
+_CRC = struct.Struct(">H")
+
+
+class FrameError(ValueError):
+    """A frame's payload does not decode to a protocol line."""
+
+
+# --- Varints ---
+
+def _put_varint(out, value):
+    """Append ``value`` zigzag-encoded as a little-endian base-128 varint."""
+    value = -2 * value - 1 if value < 0 else 2 * value
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos):
+    """Decode one zigzag varint at ``pos``. Returns (value, next_pos)."""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise FrameError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (result >> 1) ^ -(result & 1), pos
+
+
+# --- Frames ---
+
+def pack_frame(frame_type, payload=b""):
+    """Wrap ``payload`` in a frame."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload too long: {len(payload)} bytes")
+    body = bytes((len(payload), frame_type)) + payload
+    return bytes((SYNC,)) + body + _CRC.pack(binascii.crc_hqx(body, 0xFFFF))
+
+
+def read_frame(buf, start=0):
+    """Find the next frame in ``buf`` from ``start``.
+
+    Returns (frame_type, payload, end), where ``end`` is where the next
+    search starts, or None if more bytes are needed. Two special results:
+    (T_NOISE, b"", end) for bytes before a sync byte, which callers drop, and
+    (None, None, end) for a candidate whose CRC failed.
+    """
+    sync = buf.find(SYNC, start)
+    if sync != start:
+        if sync < 0:
+            return (T_NOISE, b"", len(buf)) if len(buf) > start else None
+        return T_NOISE, b"", sync
+    if sync + HEADER_SIZE > len(buf):
+        return None
+    end = sync + HEADER_SIZE + buf[sync + 1] + CRC_SIZE
+    if end > len(buf):
+        return None
+    body = bytes(buf[sync + 1:end - CRC_SIZE])
+    if _CRC.unpack_from(buf, end - CRC_SIZE)[0] != binascii.crc_hqx(body, 0xFFFF):
+        # Resync on the next sync byte, which may be inside this candidate
+        return None, None, sync + 1
+    return body[1], body[2:], end
+
+
+# --- ASCII line <-> frame ---
+
+def encode_line(line):
+    """Frame one protocol line (bytes or str, with or without the newline)."""
+    if isinstance(line, str):
+        line = line.encode("ascii")
+    line = line.rstrip(b"\r\n")
+    head = line[:1]
+    try:
+        if head in (b"M", b"A"):
+            return _encode_move(line)
+        if head == b"S" and line[1:2] == b":":
+            return _encode_telemetry(line)
+        if line == b"OK":
+            return pack_frame(T_OK)
+        if head == b"E" and line[:3] == b"ERR":
+            code, _, text = line[3:].partition(b":")
+            return pack_frame(T_ERR, bytes((int(code),)) + text)
+        if head == b"D" and len(line) == 2 and line[1:].isdigit():
+            return pack_frame(T_DONE, bytes((int(line[1:]),)))
+        if line[:7] == b"ENDSTOP" and line[7:].isdigit():
+            return pack_frame(T_ENDSTOP, bytes((int(line[7:]),)))
+    except (ValueError, IndexError):
+        pass
+    return pack_frame(T_LINE, line)
+
+
+def encode_lines(data):
+    """Frame every complete line in ``data``."""
+    return b"".join(encode_line(line) for line in data.split(b"\n") if line)
+
+
+def _encode_move(line):
+    # <M|A><axis><value>[S|G|R]
+    axis = line[1] - 48
+    unit = line[-1:].decode("ascii")
+    digits = line[2:-1] if unit in _UNITS else line[2:]
+    if unit not in _UNITS:
+        unit = "S"
+    if not 1 <= axis <= 7:
+        raise ValueError("Bad axis")
+    flags = (0x80 if line[:1] == b"A" else 0) | (axis << 4) | _UNITS.index(unit)
+    out = bytearray((flags,))
+    whole, dot, frac = digits.partition(b".")
+    if dot:
+        if unit == "S" or len(frac) > 255:
+            raise ValueError("Fractional steps")
+        out.append(len(frac))
+        _put_varint(out, int(whole + frac))
+    else:
+        if unit != "S":
+            out.append(0)
+        _put_varint(out, int(digits))
+    return pack_frame(T_MOVE, bytes(out))
+
+
+def _encode_telemetry(line):
+    fields, _, age = line[2:].partition(b" age=")
+    out = bytearray((1 if age else 0,))
+    values = fields.split(b",")
+    out.append(len(values))
+    for value in values:
+        _put_varint(out, int(value))
+    if age:
+        _put_varint(out, int(age))
+    return pack_frame(T_TELEMETRY, bytes(out))
+
+
+def decode_frame(frame_type, payload):
+    """Turn a frame back into its ASCII line, newline included (bytes)."""
+    if frame_type == T_LINE:
+        return payload + b"\n"
+    if frame_type == T_MOVE:
+        return _decode_move(payload)
+    if frame_type == T_TELEMETRY:
+        return _decode_telemetry(payload)
+    if frame_type == T_OK:
+        return b"OK\n"
+    if frame_type == T_ERR and payload:
+        text = payload[1:]
+        return b"ERR%d%s\n" % (payload[0], b":" + text if text else b"")
+    if frame_type == T_DONE and len(payload) == 1:
+        return b"D%d\n" % payload[0]
+    if frame_type == T_ENDSTOP and len(payload) == 1:
+        return b"ENDSTOP%d\n" % payload[0]
+    raise FrameError(f"Unknown frame type 0x{frame_type:02x}")
+
+
+def _decode_move(payload):
+    if not payload:
+        raise FrameError("Empty move")
+    flags = payload[0]
+    letter = b"A" if flags & 0x80 else b"M"
+    axis = (flags >> 4) & 0x07
+    unit_index = flags & 0x03
+    if unit_index >= len(_UNITS):
+        raise FrameError("Bad unit")
+    unit = _UNITS[unit_index]
+    if unit == "S":
+        value, _ = _get_varint(payload, 1)
+        return b"%s%d%d\n" % (letter, axis, value)
+    if len(payload) < 2:
+        raise FrameError("Truncated move")
+    decimals = payload[1]
+    value, _ = _get_varint(payload, 2)
+    if decimals:
+        sign = "-" if value < 0 else ""
+        digits = str(abs(value)).rjust(decimals + 1, "0")
+        text = f"{sign}{digits[:-decimals]}.{digits[-decimals:]}"
+    else:
+        text = str(value)
+    return b"%s%d%s%s\n" % (letter, axis, text.encode("ascii"), unit.encode("ascii"))
+
+
+def _decode_telemetry(payload):
+    if len(payload) < 2:
+        raise FrameError("Truncated telemetry")
+    has_age = payload[0] & 1
+    pos = 2
+    values = []
+    for _ in range(payload[1]):
+        value, pos = _get_varint(payload, pos)
+        values.append(b"%d" % value)
+    line = b"S:" + b",".join(values)
+    if has_age:
+        age, pos = _get_varint(payload, pos)
+        line += b" age=%d" % age
+    return line + b"\n"
+
+
+class FramedPort:
+    """Wrap a pyserial-like port so callers keep reading and writing ASCII.
+
+    ``write()`` frames each line and ``readline()`` returns the next valid
+    frame as an ASCII line (b"" on timeout). Corrupted frames are counted in
+    ``errors`` and skipped. Any other attribute is delegated to the port.
+    """
+
+    def __init__(self, port):
+        self._port = port
+        self._rbuf = bytearray()
+        self.errors = 0
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def write(self, data):
+        return self._port.write(encode_lines(data))
+
+    def readline(self):
+        while True:
+            result = read_frame(self._rbuf)
+            if result is not None:
+                frame_type, payload, end = result
+                del self._rbuf[:end]
+                if frame_type == T_NOISE:
+                    continue
+                if frame_type is None:
+                    self.errors += 1
+                    continue
+                try:
+                    return decode_frame(frame_type, payload)
+                except FrameError:
+                    self.errors += 1
+                    continue
+            chunk = self._port.read(max(1, self._port.in_waiting))
+            if not chunk:
+                return b""
+            self._rbuf += chunk
+
+
+def _drain(port, deadline, quiet=0.05):
+    """Discard input until the link has been silent for ``quiet`` seconds."""
+    port.reset_input_buffer()
+    port.timeout = quiet
+    while time.monotonic() < deadline and port.readline():
+        pass
+
+
+def negotiate(port, timeout=1.0):
+    """Ask the broker for frames on ``port``. Returns a FramedPort or None.
+
+    Replies still in flight (the OK of an earlier command, D<n>, telemetry)
+    are drained first, and only the broker's own "OK:B1" turns framing on,
+    so a stray OK is never taken for the answer. ERR1 (a Mega without a
+    broker, or a broker in threads mode) or silence leaves the link in ASCII.
+    """
+    original_timeout = port.timeout
+    deadline = time.monotonic() + timeout
+    try:
+        _drain(port, deadline)
+        port.timeout = max(0.0, deadline - time.monotonic())
+        port.write(NEGOTIATE)
+        while time.monotonic() < deadline:
+            reply = port.readline().strip()
+            if reply == NEGOTIATE_OK:
+                return FramedPort(port)
+            if not reply or reply.startswith(b"ERR1"):
+                return None
+        return None
+    finally:
+        port.timeout = original_timeout
+
+
+# --- Benchmark ---
+
+def _benchmark(number=100000):
+    import timeit
+
+    # What a path run looks like on the wire, both directions
+    lines = [b"A3-12345\n", b"M1145.5G\n", b"OK\n", b"OK\n", b"S\n",
+             b"S:12034,-2310,455,0,8000,1200,1,1,0,1,1,1 age=37\n",
+             b"D3\n", b"ERR8:Busy\n", b"C\n", b"c\n"]
+    framed = [encode_line(line) for line in lines]
+    ascii_bytes = sum(len(line) for line in lines)
+    framed_bytes = sum(len(frame) for frame in framed)
+    print(f"{'message':52s} {'ASCII':>5s} {'frame':>5s}")
+    for line, frame in zip(lines, framed):
+        print(f"{line.decode().strip():52s} {len(line):5d} {len(frame):5d}")
+    print(f"{'total':52s} {ascii_bytes:5d} {framed_bytes:5d}")
+
+    wire = b"".join(framed)
+
+    def run_encode():
+        for line in lines:
+            encode_line(line)
+
+    def run_decode():
+        pos = 0
+        while True:
+            result = read_frame(wire, pos)
+            if result is None:
+                break
+            frame_type, payload, pos = result
+            decode_frame(frame_type, payload)
+
+    def run_ascii():
+        # Baseline: what the ASCII path does per line (split + decode)
+        for line in b"".join(lines).split(b"\n"):
+            line.decode("ascii")
+
+    for name, func in (("encode", run_encode), ("read+decode", run_decode),
+                       ("ASCII split", run_ascii)):
+        seconds = min(timeit.repeat(func, number=number // len(lines), repeat=3))
+        print(f"{name:12s} {number / seconds:12,.0f} messages/s")
+    # 115200 baud 8N1 = 11520 bytes/s
+    print(f"at 115200 baud: ASCII {11520 * len(lines) / ascii_bytes:,.0f} msg/s, "
+          f"framed {11520 * len(lines) / framed_bytes:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,258 @@
+"""
+Path Executor - Streams a saved path to the robot pose by pose.
+
+The Mega keeps a single target per axis (a new A<n> replaces the running
+move), so poses cannot be queued on the board. Instead a worker thread
+keeps a lookahead window of upcoming poses already converted to step
+targets, and writes the next one with move_many() the moment the current
+MotionHandle completes, i.e. as soon as the reader thread sees the last
+D<n>. No sleeps: throughput is set by how fast the arm reaches each pose.
+
+Poses are absolute positions in steps, one value per axis starting at
+axis 1 (as stored by PathManager). Only axes that change between poses
+are sent, so each pose is one short write.
+
+With ``synchronized`` (PATH_SYNCHRONIZED) the whole path is planned up
+front by trajectory_planner, and every pose also carries per-axis
+Q<eje> speed/accel lines so all moving axes arrive together. The global
+profile is restored when the run ends.
+
+Pause and step take effect at the next pose boundary; abort decelerates
+the moving axes to a stop (K<n>). Progress is reported through
+``on_progress(state, index, total)``, called from the worker thread.
+"""
+import threading
+from collections import deque
+
+from config import (
+    AXIS_COUNT, DEFAULT_SPEED, DEFAULT_ACCEL,
+    PATH_LOOKAHEAD, PATH_SYNCHRONIZED, PATH_PROFILE, PATH_MAX_JERK
+)
+from robot_events import ConnectionChanged
+from trajectory_planner import plan
+
+IDLE = "IDLE"
+RUNNING = "RUNNING"
+PAUSED = "PAUSED"
+DONE = "DONE"
+ABORTED = "ABORTED"
+FAILED = "FAILED"
+
+ACTIVE_STATES = (RUNNING, PAUSED)
+
+
+class PathExecutor:
+    """Runs one path at a time on a RobotClient."""
+
+    def __init__(self, client, lookahead=PATH_LOOKAHEAD, on_progress=None,
+                 synchronized=PATH_SYNCHRONIZED):
+        self.client = client
+        self.lookahead = max(1, int(lookahead))
+        self.synchronized = synchronized
+        self.on_progress = on_progress
+        self.state = IDLE
+        self.index = 0      # poses completed
+        self.total = 0
+        self.error = None
+        self._points = []
+        self._plan = None
+        self._cond = threading.Condition()
+        self._steps = 0     # poses still allowed while paused
+        self._aborting = False
+        self._handle = None
+        self._thread = None
+        client.events.subscribe(ConnectionChanged, self._on_connection)
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_STATES
+
+    def start(self, points, paused=False):
+        """Run ``points``; with ``paused`` nothing moves until step()/resume().
+
+        Returns False if not connected or a path is already running.
+        """
+        with self._cond:
+            if self.active or not self.client.connected:
+                return False
+            self._points = points
+            self.total = len(points)
+            self.index = 0
+            self.error = None
+            self._steps = 0
+            self._aborting = False
+            self._handle = None
+            self.state = PAUSED if paused else RUNNING
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._report()
+        return True
+
+    def pause(self):
+        """Stop after the pose being executed."""
+        with self._cond:
+            if self.state != RUNNING:
+                return
+            self.state = PAUSED
+            self._steps = 0
+        self._report()
+
+    def resume(self):
+        with self._cond:
+            if self.state != PAUSED:
+                return
+            self.state = RUNNING
+            self._steps = 0
+            self._cond.notify_all()
+        self._report()
+
+    def step(self):
+        """While paused, execute exactly one more pose."""
+        with self._cond:
+            if self.state != PAUSED:
+                return
+            self._steps += 1
+            self._cond.notify_all()
+
+    def abort(self):
+        """Stop feeding poses and bring the moving axes to a controlled stop."""
+        with self._cond:
+            if not self.active:
+                return
+            self._aborting = True
+            handle = self._handle
+            self._cond.notify_all()
+        if handle is not None and not handle.done():
+            self.client.stop_axes(handle.remaining())
+            handle.cancel()
+
+    def _on_connection(self, event):
+        """A dropped link loses the D<n> of the running pose: fail the path."""
+        if event.connected:
+            return
+        with self._cond:
+            if not self.active:
+                return
+            self.error = "Link lost"
+            self._aborting = True
+            handle = self._handle
+            self._cond.notify_all()
+        if handle is not None:
+            handle.cancel()
+
+    def _report(self):
+        if self.on_progress is not None:
+            self.on_progress(self.state, self.index, self.total)
+
+    @staticmethod
+    def _prepare(point, previous):
+        """Step targets for ``point``, without the axes ``previous`` already set."""
+        targets = {axis: int(round(float(value)))
+                   for axis, value in enumerate(point[:AXIS_COUNT])}
+        if previous is None:
+            return targets, targets
+        changed = {axis: pos for axis, pos in targets.items()
+                   if previous.get(axis) != pos}
+        return changed, {**previous, **changed}
+
+    def _fill(self, ahead, cursor, previous):
+        """Top up the lookahead window. Returns the new cursor and last pose."""
+        while len(ahead) < self.lookahead and cursor < self.total:
+            if self._plan is not None:
+                ahead.append(self._plan.segment(cursor))
+                cursor += 1
+                continue
+            try:
+                targets, previous = self._prepare(self._points[cursor], previous)
+            except (TypeError, ValueError) as e:
+                # Caught before the arm gets there: the path stops short of it
+                ahead.append(e)
+                return self.total, previous
+            ahead.append((targets, None))
+            cursor += 1
+        return cursor, previous
+
+    def _run(self):
+        ahead = deque()
+        # Fresh positions: move_many skips waiting on axes already in place
+        self.client.update_status()
+        limits = self.client.profile or (DEFAULT_SPEED, DEFAULT_ACCEL)
+        self._plan = None
+        if self.synchronized:
+            try:
+                start = self.client.state.axes[:len(self._points[0])]
+                self._plan = plan(self._points, *limits, profile=PATH_PROFILE,
+                                  max_jerk=PATH_MAX_JERK, start=start)
+            except (TypeError, ValueError) as e:
+                with self._cond:
+                    self.error = f"Bad path: {e}"
+                    self.state = FAILED
+                print(f"Path error: {self.error}")
+                self._report()
+                return
+        cursor, previous = self._fill(ahead, 0, None)
+        first = True
+        while True:
+            with self._cond:
+                while self.state == PAUSED and not self._steps and not self._aborting:
+                    self._cond.wait()
+                if self._aborting:
+                    break
+                if not ahead:
+                    self.state = DONE
+                    break
+                if self.state == PAUSED:
+                    self._steps -= 1
+                entry = ahead.popleft()
+                if isinstance(entry, Exception):
+                    self.error = f"Bad pose {self.index + 1}: {entry}"
+                    self.state = FAILED
+                    break
+            targets, profiles = entry
+
+            handle = None
+            if targets:
+                # After the first pose (and in planned segments) every sent
+                # axis changes, so all must report
+                handle = self.client.move_many(targets, wait_all=not first or profiles is not None,
+                                               profiles=profiles)
+                if handle is None:
+                    with self._cond:
+                        self.error = "Not connected"
+                        self.state = FAILED
+                    break
+                with self._cond:
+                    self._handle = handle
+                    aborting = self._aborting
+                if aborting:
+                    self.client.stop_axes(handle.remaining())
+                    handle.cancel()
+            first = False
+
+            # Prepare the next poses while the arm moves
+            cursor, previous = self._fill(ahead, cursor, previous)
+            if handle is not None:
+                handle.wait()
+
+            with self._cond:
+                self._handle = None
+                if self._aborting:
+                    break
+                if handle is not None and handle.errors:
+                    errors = ", ".join(f"axis {axis + 1}: {error}"
+                                       for axis, error in sorted(handle.errors.items()))
+                    self.error = f"Pose {self.index + 1} failed ({errors})"
+                    self.state = FAILED
+                    break
+                self.index += 1
+            self._report()
+
+        with self._cond:
+            if self._aborting:
+                self.state = FAILED if self.error else ABORTED
+        if self._plan is not None and self.client.connected:
+            # Q<eje> profiles stay on the Mega until the next P<param>
+            self.client.set_profile(*limits)
+        if self.error:
+            print(f"Path error: {self.error}")
+        self._report()
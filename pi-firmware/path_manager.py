@@ -1,58 +1,329 @@
 """
 Path Manager - Handles saving and loading robot movement paths.
 Migrated from feature/lcd-kernel-driver branch.
+
+Paths are stored in SQLite, one row per path, so an edit only writes
+that path's row. The database runs in WAL mode with synchronous=FULL:
+every change is a single committed transaction, and a power cut leaves
+either the old or the new row, never a half-written library.
+
+The ``paths`` table is a small index (name, point count, duration
+estimate, bounding box, last modified); the point lists live in
+``path_points`` and are only read when a path is opened, through a
+bounded LRU cache. Listing the library never parses a point.
+
+With PATH_AUTO_SIMPLIFY, points are run through path_simplifier before
+they are stored; simplify_path() does the same on demand.
+
+A legacy paths.json next to the database is imported on first start and
+kept as paths.json.bak.
 """
 import json
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    PATH_CACHE_SIZE, AXES_CONFIG_FILE,
+    PATH_AUTO_SIMPLIFY, PATH_SIMPLIFY_TOLERANCE, PATH_SIMPLIFY_UNIT
+)
+from path_simplifier import estimate_time, simplify, tolerance_steps
+from units import StepConverter
+
+SCHEMA_VERSION = 2
+
+_CREATE_TABLES = (
+    "CREATE TABLE paths ("
+    " id INTEGER PRIMARY KEY,"
+    " name TEXT NOT NULL UNIQUE,"
+    " point_count INTEGER NOT NULL,"
+    " duration REAL NOT NULL,"
+    " bbox TEXT,"
+    " modified REAL NOT NULL)",
+    "CREATE TABLE path_points ("
+    " path_id INTEGER PRIMARY KEY,"
+    " points TEXT NOT NULL)",
+)
+
+_INFO_COLUMNS = "name, point_count, duration, bbox, modified"
+
+
+def bounding_box(points):
+    """Per-axis [minimums, maximums] of ``points``, or None if empty."""
+    if not points:
+        return None
+    axes = list(zip(*points))
+    return [[min(axis) for axis in axes], [max(axis) for axis in axes]]
+
+
+class PathInfo:
+    """Index entry for a saved path; the points are loaded separately."""
+
+    __slots__ = ("name", "point_count", "duration", "bbox", "modified")
+
+    def __init__(self, name, point_count=0, duration=0.0, bbox=None, modified=0.0):
+        self.name = name
+        self.point_count = point_count
+        self.duration = duration
+        self.bbox = bbox
+        self.modified = modified
+
+    @classmethod
+    def from_row(cls, row):
+        name, point_count, duration, bbox, modified = row
+        return cls(name, point_count, duration,
+                   json.loads(bbox) if bbox else None, modified)
+
+    def __repr__(self):
+        return (f"PathInfo({self.name!r} points={self.point_count} "
+                f"duration={self.duration:.1f}s)")
 
 
 class PathManager:
-    def __init__(self, filename="paths.json"):
+    def __init__(self, filename="paths.sqlite3", legacy_filename="paths.json",
+                 cache_size=PATH_CACHE_SIZE, auto_simplify=PATH_AUTO_SIMPLIFY):
         self.filename = filename
-        self.paths = {}
-        self.load()
+        self.legacy_filename = legacy_filename
+        self.cache_size = cache_size
+        self.auto_simplify = auto_simplify
+        converter = None
+        if PATH_SIMPLIFY_UNIT != "S":
+            converter = StepConverter.from_config(AXES_CONFIG_FILE)
+        # Per-axis tolerance in steps
+        self.simplify_tolerance = tolerance_steps(
+            PATH_SIMPLIFY_TOLERANCE, PATH_SIMPLIFY_UNIT, converter)
+        # name -> points, most recently used last
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = self._connect()
+        self._migrate_json()
 
-    def load(self):
-        """Load paths from JSON file."""
-        if os.path.exists(self.filename):
+    def _connect(self):
+        """Open the database and create or upgrade the schema."""
+        # Autocommit mode: transactions are opened explicitly in _write()
+        db = sqlite3.connect(self.filename, isolation_level=None,
+                             check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if version == 1:
+                    self._upgrade_v1(db)
+                else:
+                    for sql in _CREATE_TABLES:
+                        db.execute(sql)
+                db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                db.execute("COMMIT")
+            except sqlite3.Error:
+                db.execute("ROLLBACK")
+                db.close()
+                raise
+        return db
+
+    def _upgrade_v1(self, db):
+        """Split the v1 table (name, points) into index and payload tables."""
+        db.execute("ALTER TABLE paths RENAME TO paths_v1")
+        for sql in _CREATE_TABLES:
+            db.execute(sql)
+        now = time.time()
+        rows = db.execute("SELECT name, points FROM paths_v1 ORDER BY id").fetchall()
+        for name, points in rows:
+            for sql, params in self._upsert(name, json.loads(points), now):
+                db.execute(sql, params)
+        db.execute("DROP TABLE paths_v1")
+
+    def _write(self, statements):
+        """Run (sql, params) pairs in one transaction."""
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                for sql, params in statements:
+                    self._db.execute(sql, params)
+                self._db.execute("COMMIT")
+                return True
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                print(f"Error saving paths: {e}")
+                return False
+
+    def _query(self, sql, params=()):
+        with self._lock:
             try:
-                with open(self.filename, 'r') as f:
-                    self.paths = json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
+                return self._db.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
                 print(f"Error loading paths: {e}")
-                self.paths = {}
-        else:
-            self.paths = {}
+                return []
 
-    def save(self):
-        """Save paths to JSON file."""
+    @staticmethod
+    def _upsert(name, points, modified=None):
+        """Statements that store ``points`` under ``name`` with fresh metadata."""
+        bbox = bounding_box(points)
+        try:
+            duration = estimate_time(points)
+        except ValueError:
+            # Poses of different lengths: stored as given, without an estimate
+            duration = 0.0
+        # ON CONFLICT keeps the row id, so an updated path keeps its place in the list
+        return [
+            ("INSERT INTO paths (name, point_count, duration, bbox, modified)"
+             " VALUES (?, ?, ?, ?, ?)"
+             " ON CONFLICT(name) DO UPDATE SET point_count = excluded.point_count,"
+             " duration = excluded.duration, bbox = excluded.bbox,"
+             " modified = excluded.modified",
+             (name, len(points), duration,
+              json.dumps(bbox) if bbox else None,
+              modified if modified is not None else time.time())),
+            ("INSERT OR REPLACE INTO path_points (path_id, points)"
+             " VALUES ((SELECT id FROM paths WHERE name = ?), ?)",
+             (name, json.dumps(points, separators=(',', ':')))),
+        ]
+
+    def _cache_put(self, name, points):
+        # Frozen copy: callers own the lists they pass in and get back
+        try:
+            points = tuple(tuple(point) for point in points)
+        except TypeError:
+            # Malformed poses: always read back from the database
+            return
+        with self._lock:
+            self._cache[name] = points
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _migrate_json(self):
+        """Import the legacy JSON library into an empty database."""
+        if not self.legacy_filename or not os.path.exists(self.legacy_filename):
+            return
+        if self.count_paths():
+            return
         try:
-            with open(self.filename, 'w') as f:
-                json.dump(self.paths, f, indent=2)
-        except IOError as e:
-            print(f"Error saving paths: {e}")
+            with open(self.legacy_filename, 'r') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading paths: {e}")
+            return
+        statements = []
+        for name, points in legacy.items():
+            statements.extend(self._upsert(name, points))
+        if self._write(statements):
+            os.replace(self.legacy_filename, self.legacy_filename + ".bak")
+            print(f"Imported {len(legacy)} paths from {self.legacy_filename}")
+
+    def load(self):
+        """Drop cached points; they are read again from the database on demand."""
+        with self._lock:
+            self._cache.clear()
+
+    def save(self):
+        """Kept for compatibility: every change is committed as it is made."""
+
+    def compact(self):
+        """Fold the WAL into the database and reclaim free pages."""
+        with self._lock:
+            try:
+                # VACUUM rebuilds the file atomically; a crash keeps the old copy
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._db.execute("VACUUM")
+            except sqlite3.Error as e:
+                print(f"Error compacting paths: {e}")
+
+    def close(self):
+        """Checkpoint and close the database."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def count_paths(self):
+        """Number of saved paths."""
+        rows = self._query("SELECT COUNT(*) FROM paths")
+        return rows[0][0] if rows else 0
 
     def get_path_names(self):
         """Get list of all path names."""
-        return list(self.paths.keys())
+        return [name for name, in self._query("SELECT name FROM paths ORDER BY id")]
+
+    def get_path_info(self, name):
+        """Index entry for ``name`` (PathInfo), or None if it does not exist."""
+        rows = self._query(f"SELECT {_INFO_COLUMNS} FROM paths WHERE name = ?", (name,))
+        return PathInfo.from_row(rows[0]) if rows else None
+
+    def list_path_info(self, offset=0, limit=None):
+        """Index entries in list order, ``limit`` at a time starting at ``offset``."""
+        rows = self._query(
+            f"SELECT {_INFO_COLUMNS} FROM paths ORDER BY id LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset)
+        )
+        return [PathInfo.from_row(row) for row in rows]
+
+    def _simplify(self, name, points):
+        """SimplifyResult for ``points``, or None if they cannot be simplified."""
+        try:
+            return simplify(points, self.simplify_tolerance)
+        except (TypeError, ValueError) as e:
+            print(f"Cannot simplify path {name}: {e}")
+            return None
+
+    def simplify_path(self, name):
+        """Simplify a stored path in place. Returns the SimplifyResult or None."""
+        if not self._query("SELECT 1 FROM paths WHERE name = ?", (name,)):
+            return None
+        result = self._simplify(name, self.get_path(name))
+        if result is not None and result.removed:
+            self._store(name, result.points)
+        return result
 
     def add_path(self, name, points=None):
         """Add a new path or update existing one."""
-        self.paths[name] = points if points is not None else []
-        self.save()
+        points = points if points is not None else []
+        if self.auto_simplify and len(points) > 2:
+            result = self._simplify(name, points)
+            if result is not None:
+                if result.removed:
+                    print(f"Path {name}: {result}")
+                points = result.points
+        self._store(name, points)
+
+    def _store(self, name, points):
+        if self._write(self._upsert(name, points)):
+            self._cache_put(name, points)
 
     def delete_path(self, name):
         """Delete a path by name."""
-        if name in self.paths:
-            del self.paths[name]
-            self.save()
+        if self._write([
+            ("DELETE FROM path_points WHERE path_id = (SELECT id FROM paths WHERE name = ?)", (name,)),
+            ("DELETE FROM paths WHERE name = ?", (name,)),
+        ]):
+            with self._lock:
+                self._cache.pop(name, None)
 
     def get_path(self, name):
-        """Get points for a specific path."""
-        return self.paths.get(name, [])
+        """Get points for a specific path (a new list the caller may edit)."""
+        with self._lock:
+            if name in self._cache:
+                self._cache.move_to_end(name)
+                return [list(point) for point in self._cache[name]]
+        rows = self._query(
+            "SELECT points FROM path_points"
+            " WHERE path_id = (SELECT id FROM paths WHERE name = ?)", (name,)
+        )
+        if not rows:
+            return []
+        try:
+            points = json.loads(rows[0][0])
+        except json.JSONDecodeError as e:
+            print(f"Error loading path {name}: {e}")
+            return []
+        self._cache_put(name, points)
+        return points
 
     def update_path_points(self, name, points):
         """Update points for an existing path."""
-        if name in self.paths:
-            self.paths[name] = points
-            self.save()
+        if self._query("SELECT 1 FROM paths WHERE name = ?", (name,)):
+            self.add_path(name, points)
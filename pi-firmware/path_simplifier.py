@@ -0,0 +1,154 @@
+"""
+Path Simplifier - Drops recorded points that add nothing to a path.
+
+Paths recorded by sampling telemetry are full of nearly collinear poses,
+and the executor stops at every pose. This is Ramer-Douglas-Peucker in
+joint space: a point is kept only if it lies farther than the per-axis
+tolerance from the straight joint-space line between its neighbours. That
+line is exactly what a synchronized segment follows (trajectory_planner),
+so the simplified path stays within tolerance of the recorded one.
+
+Instead of recursing segment by segment, every pass measures all points
+against their current segment at once with NumPy and splits each segment
+at its farthest point, so the number of passes is the recursion depth.
+
+Running this module benchmarks simplify() on a noisy recorded path:
+
+    python path_simplifier.py
+"""
+import numpy as np
+
+from config import DEFAULT_SPEED, DEFAULT_ACCEL
+from trajectory_planner import segment_times
+
+
+class SimplifyResult:
+    """Simplified points plus what was gained."""
+
+    __slots__ = ("points", "original_count", "time_before", "time_after")
+
+    def __init__(self, points, original_count, time_before, time_after):
+        self.points = points
+        self.original_count = original_count
+        self.time_before = time_before
+        self.time_after = time_after
+
+    @property
+    def removed(self):
+        return self.original_count - len(self.points)
+
+    @property
+    def time_saved(self):
+        return self.time_before - self.time_after
+
+    def __str__(self):
+        return (f"Removed {self.removed} of {self.original_count} points, "
+                f"~{self.time_saved:.1f} s faster ({self.time_before:.1f} s -> "
+                f"{self.time_after:.1f} s)")
+
+
+def tolerance_steps(tolerance, unit="S", converter=None):
+    """Per-axis tolerance in steps from ``tolerance`` in ``unit`` (S, G, R).
+
+    Degrees and radians need a units.StepConverter.
+    """
+    if unit == "S":
+        return tolerance
+    if converter is None:
+        raise ValueError(f"Tolerance in {unit} needs a StepConverter")
+    values = np.broadcast_to(np.asarray(tolerance, dtype=float), (converter.axis_count,))
+    # Positions are whole steps: never less than one step per axis
+    return [max(1, steps) for steps in converter.convert_batch([values], unit)[0]]
+
+
+def estimate_time(points, speed=DEFAULT_SPEED, accel=DEFAULT_ACCEL):
+    """Seconds to run ``points`` stop and go, one trapezoid per segment.
+
+    Axes move together, so each segment lasts as long as its slowest axis
+    (trajectory_planner.segment_times). ``speed`` and ``accel`` are in
+    point units per second, steps for paths recorded in steps. PathManager
+    stores this as the path's duration.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2:
+        return 0.0
+    return float(segment_times(np.diff(points, axis=0), speed, accel).max(axis=1).sum())
+
+
+def simplify_mask(points, tolerance):
+    """Boolean mask of the points to keep (first and last always are).
+
+    ``tolerance`` is in steps, a scalar or one value per axis.
+    """
+    points = np.asarray(points, dtype=float)
+    count = len(points)
+    keep = np.zeros(count, dtype=bool)
+    if count <= 2:
+        keep[:] = True
+        return keep
+    tolerance = np.broadcast_to(np.asarray(tolerance, dtype=float), (points.shape[1],))
+    if np.any(tolerance <= 0):
+        raise ValueError("tolerance must be positive")
+    # In tolerance units a point is within bounds if every |deviation| <= 1
+    scaled = points / tolerance
+    keep[0] = keep[-1] = True
+    index = np.arange(count)
+
+    while True:
+        kept = np.flatnonzero(keep)
+        segment = np.minimum(np.searchsorted(kept, index, side="right") - 1, len(kept) - 2)
+        start = scaled[kept[segment]]
+        chord = scaled[kept[segment + 1]] - start
+        offset = scaled - start
+        length = (chord * chord).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(length > 0, (offset * chord).sum(axis=1) / length, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        deviation = np.abs(offset - t[:, None] * chord).max(axis=1)
+        deviation[keep] = 0.0
+
+        # Farthest point of every segment; split those beyond tolerance
+        farthest = np.maximum.reduceat(deviation, kept[:-1])
+        split = farthest > 1.0
+        if not split.any():
+            return keep
+        candidates = np.flatnonzero(split[segment] & (deviation == farthest[segment]))
+        _, first = np.unique(segment[candidates], return_index=True)
+        keep[candidates[first]] = True
+
+
+def simplify(points, tolerance, speed=DEFAULT_SPEED, accel=DEFAULT_ACCEL):
+    """Simplify ``points`` within ``tolerance`` steps per axis.
+
+    Returns a SimplifyResult whose points are plain lists, as PathManager
+    stores them.
+    """
+    if len(points) <= 2:
+        time = estimate_time(points, speed, accel) if points else 0.0
+        return SimplifyResult(list(points), len(points), time, time)
+    array = np.asarray(points, dtype=float)
+    kept = [points[index] for index in np.flatnonzero(simplify_mask(array, tolerance))]
+    return SimplifyResult(kept, len(points),
+                          estimate_time(array, speed, accel),
+                          estimate_time(kept, speed, accel))
+
+
+def _benchmark(count=20000):
+    import time
+
+    # A slow sweep on every axis, sampled with a step of jitter
+    rng = np.random.default_rng(0)
+    t = np.linspace(0.0, 4.0 * np.pi, count)[:, None]
+    phases = np.arange(6)
+    points = (5000 + 3000 * np.sin(t + phases)).round() + rng.integers(-1, 2, size=(count, 6))
+    points = points.astype(int).tolist()
+    for tolerance in (2, 10, 50):
+        started = time.perf_counter()
+        result = simplify(points, tolerance)
+        elapsed = time.perf_counter() - started
+        print(f"tolerance {tolerance:3d} steps: {len(result.points):6d} points in "
+              f"{elapsed * 1000:.0f} ms. {result}")
+
+
+if __name__ == "__main__":
+    _benchmark()
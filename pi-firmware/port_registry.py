@@ -0,0 +1,249 @@
+"""
+Port Registry - Cached serial port list kept current by hotplug events.
+
+Listing ports with serial.tools.list_ports walks sysfs for every device, which
+is too slow to do on the Tk thread each time the connection dropdown opens.
+The registry scans once, then a background thread watches /dev with inotify
+and rescans only when a tty node is created or removed (udev creates the
+node once the sysfs entry with the USB metadata exists). Platforms without
+inotify fall back to rescanning every PORT_POLL_INTERVAL seconds.
+
+Readers get the cached tuple of PortInfo without blocking; subscribers are
+called with the new tuple whenever it changes.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+import serial.tools.list_ports
+
+from config import PORT_POLL_INTERVAL, PORT_SETTLE_DELAY
+
+# inotify(7) constants
+_IN_ATTRIB = 0x00000004
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_WATCH_MASK = _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_ATTRIB
+_EVENT_HEADER = struct.Struct("iIII")   # wd, mask, cookie, len
+
+
+class PortInfo:
+    """Serial port description with its USB identity (None if not USB)."""
+
+    __slots__ = ("device", "description", "vid", "pid", "serial_number",
+                 "manufacturer", "location")
+
+    def __init__(self, device, description="", vid=None, pid=None,
+                 serial_number=None, manufacturer=None, location=None):
+        self.device = device
+        self.description = description
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+        self.manufacturer = manufacturer
+        self.location = location
+
+    @classmethod
+    def from_list_ports(cls, info):
+        return cls(info.device, info.description, info.vid, info.pid,
+                   info.serial_number, info.manufacturer, info.location)
+
+    def _key(self):
+        return (self.device, self.description, self.vid, self.pid,
+                self.serial_number, self.manufacturer, self.location)
+
+    def __eq__(self, other):
+        return isinstance(other, PortInfo) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        usb = f" {self.vid:04X}:{self.pid:04X}" if self.vid is not None else ""
+        return f"PortInfo({self.device!r}{usb} serial={self.serial_number!r})"
+
+
+def scan_ports():
+    """Enumerate serial ports now (slow: reads sysfs for every device)."""
+    try:
+        infos = serial.tools.list_ports.comports()
+    except Exception as e:
+        print(f"Port scan error: {e}")
+        return ()
+    return tuple(sorted((PortInfo.from_list_ports(info) for info in infos),
+                        key=lambda p: p.device))
+
+
+def _open_inotify(path):
+    """Return an inotify fd watching ``path``, or None if unavailable."""
+    if not hasattr(select, "poll") or not os.path.isdir(path):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        init = libc.inotify_init1
+        add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        return None
+    if add_watch(fd, os.fsencode(path), _WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class PortRegistry:
+    """Background-maintained cache of the available serial ports."""
+
+    def __init__(self, watch_dir="/dev", poll_interval=PORT_POLL_INTERVAL,
+                 settle_delay=PORT_SETTLE_DELAY):
+        self.watch_dir = watch_dir
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay
+        self.uses_inotify = False
+        # Replaced, never mutated, so readers need no lock
+        self._ports = ()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake_r = self._wake_w = None
+        self._thread = None
+
+    def start(self):
+        """Take the initial scan and start watching for hotplug events."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._update(scan_ports())
+        fd = _open_inotify(self.watch_dir)
+        self.uses_inotify = fd is not None
+        if fd is not None:
+            self._wake_r, self._wake_w = os.pipe()
+            target = lambda: self._watch_inotify(fd)
+        else:
+            target = self._watch_polling
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"x")
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None
+
+    # --- Queries (never block on a scan) ---
+
+    def ports(self):
+        """Cached tuple of PortInfo, sorted by device name."""
+        return self._ports
+
+    def get(self, device):
+        for info in self._ports:
+            if info.device == device:
+                return info
+        return None
+
+    def find_by_serial(self, serial_number):
+        """Device currently enumerated with this USB serial number, or None."""
+        if not serial_number:
+            return None
+        for info in self._ports:
+            if info.serial_number == serial_number:
+                return info.device
+        return None
+
+    def refresh(self):
+        """Rescan synchronously (e.g. an explicit user request)."""
+        self._update(scan_ports())
+        return self._ports
+
+    # --- Subscribers ---
+
+    def subscribe(self, callback):
+        """Call ``callback(ports)`` on every change. Returns an unsubscribe function.
+
+        Callbacks run on the watcher thread (or the refresh() caller).
+        """
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [c for c in self._subscribers if c is not callback]
+        return unsubscribe
+
+    def _update(self, ports):
+        with self._lock:
+            if ports == self._ports:
+                return
+            self._ports = ports
+            subscribers = self._subscribers
+        for callback in subscribers:
+            try:
+                callback(ports)
+            except Exception as e:
+                print(f"Port registry callback error: {e}")
+
+    # --- Watchers ---
+
+    def _watch_polling(self):
+        while not self._stop.wait(self.poll_interval):
+            self._update(scan_ports())
+
+    def _watch_inotify(self, fd):
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        poller.register(self._wake_r, select.POLLIN)
+        rescan_at = None
+        try:
+            while not self._stop.is_set():
+                if rescan_at is None:
+                    timeout = None
+                else:
+                    timeout = max(0, (rescan_at - time.monotonic()) * 1000)
+                events = poller.poll(timeout)
+                if self._stop.is_set():
+                    return
+                if any(ev_fd == fd for ev_fd, _ in events) and self._read_events(fd):
+                    # Batch the burst of events udev produces for one device
+                    if rescan_at is None:
+                        rescan_at = time.monotonic() + self.settle_delay
+                if rescan_at is not None and time.monotonic() >= rescan_at:
+                    rescan_at = None
+                    self._update(scan_ports())
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_events(fd):
+        """Drain the inotify fd; True if a tty node was added or removed."""
+        relevant = False
+        while True:
+            try:
+                buf = os.read(fd, 4096)
+            except BlockingIOError:
+                return relevant
+            if not buf:
+                return relevant
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & _IN_Q_OVERFLOW or name.startswith(b"tty"):
+                    relevant = True
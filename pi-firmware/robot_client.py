@@ -1,62 +1,712 @@
-import serial
+import re
 import time
 import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import serial.tools.list_ports
+
+from config import (
+    RESPONSE_TIMEOUT, HOMING_RESPONSE_TIMEOUT, PIPELINE_WINDOW,
+    AUTO_RECONNECT, RECONNECT_BACKOFF_MIN, RECONNECT_BACKOFF_MAX, BROKER_FRAMING
+)
+from flow_control import CreditWindow
+from framing import negotiate as negotiate_framing
+from serial_link import open_port, wait_until_ready
+from robot_events import (
+    EventBus, MoveDone, EndstopHit, RobotError, Telemetry, ConnectionChanged
+)
+from port_registry import scan_ports as list_serial_ports
+from robot_state import RobotSnapshot
+from telemetry import TelemetryState, is_telemetry, parse_telemetry
+
+# parser.cpp prints the handler's ERRn and then its own OK for these
+# commands, so an error reply is not the end of the exchange for them.
+ACK_AFTER_ERROR_COMMANDS = "MAHKPQ"
+
+# Commands that start motion on one axis and end with D<n> or ENDSTOP<n>
+MOTION_COMMANDS = "MA"
+
+# Motion notifications printed by updateMotors()/handleKillAxis()
+_MOTION_EVENT = re.compile(r"(D|ENDSTOP)([1-6])")
+
+
+def axis_profile_commands(axis_idx, speed, accel):
+    """Q<eje>V / Q<eje>A lines; the Mega reads up to two decimals."""
+    return [f"Q{axis_idx+1}V{speed:.2f}".rstrip("0").rstrip("."),
+            f"Q{axis_idx+1}A{accel:.2f}".rstrip("0").rstrip(".")]
+
+
+class CommandError(Exception):
+    """Raised through a command future when the Mega answers ERR<n>."""
+
+
+class _PendingCommand:
+    """A command written to the port that still waits for its reply."""
+
+    __slots__ = ("cmd", "data", "axis", "future", "timeout", "deadline", "error")
+
+    def __init__(self, cmd, timeout):
+        self.cmd = cmd
+        self.data = (cmd + "\n").encode('utf-8')
+        # 0-based axis of an M/A command, parsed once here, else None
+        self.axis = None
+        if cmd[:1] in MOTION_COMMANDS and len(cmd) > 1 and cmd[1] in "123456":
+            self.axis = int(cmd[1]) - 1
+        self.future = Future()
+        self.timeout = timeout
+        # Restarted when the command is actually written
+        self.deadline = time.monotonic() + timeout
+        self.error = None
+
+
+class MotionHandle:
+    """Tracks a multi-axis move until every involved axis reports D<n>.
+
+    A D<n> only counts once the axis' own command was acknowledged, so a
+    completion left over from an earlier move on that axis is ignored.
+    """
+
+    def __init__(self, events, axes):
+        self.axes = tuple(sorted(axes))
+        self.errors = {}
+        self._remaining = set(self.axes)
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._callbacks = []
+        self._unsubscribe = [
+            events.subscribe(MoveDone, self._on_move_done),
+            events.subscribe(EndstopHit, self._on_endstop),
+        ]
+        if not self._remaining:
+            self._finish()
+
+    def _attach(self, axis, future):
+        """Bind the command future that started ``axis`` moving."""
+        self._futures[axis] = future
+        future.add_done_callback(lambda f, a=axis: self._on_command_done(a, f))
+
+    def _on_command_done(self, axis, future):
+        exc = future.exception()
+        if exc is not None:
+            self._settle(axis, str(exc) or type(exc).__name__)
+
+    def _on_move_done(self, event):
+        future = self._futures.get(event.axis)
+        if future is not None and future.done() and future.exception() is None:
+            self._settle(event.axis)
+
+    def _on_endstop(self, event):
+        if event.axis in self._futures:
+            self._settle(event.axis, "ENDSTOP")
+
+    def _settle(self, axis, error=None):
+        with self._lock:
+            if axis not in self._remaining:
+                return
+            self._remaining.discard(axis)
+            if error is not None:
+                self.errors[axis] = error
+            finished = not self._remaining
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._done.set()
+        for callback in self._callbacks:
+            callback(self)
+
+    def cancel(self):
+        """Stop tracking; pending axes are reported as cancelled."""
+        for axis in list(self._remaining):
+            self._settle(axis, "CANCELLED")
+
+    def done(self):
+        return self._done.is_set()
+
+    def succeeded(self):
+        return self._done.is_set() and not self.errors
+
+    def remaining(self):
+        with self._lock:
+            return set(self._remaining)
+
+    def wait(self, timeout=None):
+        """Block until every axis reported. Returns True if all succeeded."""
+        self._done.wait(timeout)
+        return self.succeeded()
+
+    def add_done_callback(self, callback):
+        """Call ``callback(handle)`` on completion (possibly on the reader thread)."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
 
 class RobotClient:
-    def __init__(self, port='/dev/ttyACM0', baud=115200):
+    def __init__(self, port='/dev/ttyACM0', baud=115200, window=PIPELINE_WINDOW,
+                 auto_reconnect=AUTO_RECONNECT, port_registry=None,
+                 framing=BROKER_FRAMING):
         self.port = port
         self.baud = baud
         self.serial = None
-        self.connected = False
+        # Ask a broker for binary frames after connecting (see framing.py)
+        self.framing = framing
+        # Current RobotSnapshot. Replaced, never mutated: readers just take
+        # the reference; writers swap it under _state_lock.
+        self._state = RobotSnapshot()
+        self._state_lock = threading.Lock()
+        # Guards writes to the port and the pending-reply queue. It is never
+        # held while waiting for the Mega to answer.
         self.lock = threading.Lock()
-        
-        # Robot State
-        self.axes = [0.0] * 6
-        self.status = "DISCONNECTED"
-        self.endstops = "000000"
-        self.last_error = ""
+        self._pending = deque()
+        # Up to `window` commands in flight without overflowing the Mega's RX buffer
+        self.window = CreditWindow(max_in_flight=window)
+        self._reader_thread = None
+
+        # Link supervision: reopen the port after a USB dropout
+        self.auto_reconnect = auto_reconnect
+        self.serial_number = None   # USB serial of the board, to find it again
+        self.reconnects = 0
+        self._want_connected = False
+        self._link_lock = threading.Lock()
+        self._supervisor_thread = None
+        self._supervisor_stop = threading.Event()
+        # Set on stop or when ports appear, to retry without waiting out the backoff
+        self._supervisor_wakeup = threading.Event()
+        # Optional PortRegistry: cached port metadata instead of rescans
+        self.port_registry = port_registry
+        if port_registry is not None:
+            port_registry.subscribe(self._on_ports_changed)
+        # Last profile sent, re-applied after a reconnect
+        self.profile = None
+
+        # Move-done, endstop, error and telemetry notifications
+        self.events = EventBus()
+        # Axes (0-based) commanded to move that have not reported D<n> yet.
+        # The writer and reader threads both change these three: only under
+        # _state_lock, which also publishes the frozen copy in the snapshot.
+        self.moving_axes = set()
+        self._targets = {}
+        # Last absolute target commanded per axis, kept after D<n>: where the
+        # axis is (or is heading), newer than any telemetry. Dropped when a
+        # stop, homing, endstop or error makes it unknown.
+        self._commanded = {}
+
+        # Seconds from opening the port to the first valid telemetry line
+        self.connect_time = None
+        # Reused for every status line, filled in by the reader thread
+        self.telemetry = TelemetryState()
+
+    # --- State snapshot ---
+
+    @property
+    def state(self):
+        """The latest RobotSnapshot (consistent, safe to read from any thread)."""
+        return self._state
+
+    def _publish_state(self, **changes):
+        """Swap in a new snapshot with ``changes`` applied."""
+        with self._state_lock:
+            self._state = self._state.replace(**changes)
+
+    # Single-field views of the snapshot, kept for existing callers
+    @property
+    def connected(self):
+        return self._state.connected
+
+    @connected.setter
+    def connected(self, value):
+        self._publish_state(connected=value)
+
+    @property
+    def status(self):
+        return self._state.status
+
+    @status.setter
+    def status(self, value):
+        self._publish_state(status=value)
+
+    @property
+    def axes(self):
+        return self._state.axes
+
+    @property
+    def endstops(self):
+        return self._state.endstops
+
+    @property
+    def last_error(self):
+        return self._state.last_error
+
+    @last_error.setter
+    def last_error(self, value):
+        self._publish_state(last_error=value)
 
     def connect(self):
-        try:
-            self.serial = serial.Serial(self.port, self.baud, timeout=1)
-            time.sleep(2) # Wait for Arduino reset
-            self.connected = True
-            self.status = "IDLE"
-            print(f"Connected to {self.port}")
+        self._want_connected = True
+        self._supervisor_stop.clear()
+        self._supervisor_wakeup.clear()
+        if self._open_link(self.port):
+            print(f"Connected to {self.port} (ready in {self.connect_time * 1000:.0f} ms)")
+            self.events.publish(ConnectionChanged(True, self.port))
             return True
+        self._want_connected = False
+        self.status = "ERROR"
+        return False
+
+    def disconnect(self):
+        self._want_connected = False
+        self._supervisor_stop.set()
+        self._supervisor_wakeup.set()
+        supervisor = self._supervisor_thread
+        if supervisor and supervisor is not threading.current_thread():
+            supervisor.join(timeout=1)
+        was_connected = self.connected
+        self._close_link(ConnectionError("Disconnected"))
+        self.status = "DISCONNECTED"
+        if was_connected:
+            self.events.publish(ConnectionChanged(False, self.port))
+
+    def _open_link(self, port, quiet=False):
+        """Open ``port``, wait for telemetry and start the reader thread."""
+        try:
+            # Keep DTR low so an already running board is not reset, then
+            # probe until it answers instead of sleeping a fixed 2 s
+            ser = open_port(port, self.baud, timeout=0.1)
+            self.connect_time = wait_until_ready(ser)
+            if self.connect_time is None:
+                ser.close()
+                raise TimeoutError(f"No telemetry from {port}")
+            if self.framing:
+                framed = negotiate_framing(ser)
+                if framed is None:
+                    if not quiet:
+                        print("Binary framing not available, using ASCII")
+                else:
+                    ser = framed
         except Exception as e:
-            print(f"Connection failed: {e}")
+            if not quiet:
+                print(f"Connection failed: {e}")
             self.connected = False
-            self.status = "ERROR"
             return False
 
-    def disconnect(self):
-        if self.serial and self.serial.is_open:
-            self.serial.close()
+        self.serial = ser
+        self.port = port
+        self.serial_number = self._lookup_serial_number(port) or self.serial_number
+        self.window.reset()
+        self._publish_state(connected=True, status="IDLE")
+        self._reader_thread = threading.Thread(
+            target=self._read_loop,
+            daemon=True
+        )
+        self._reader_thread.start()
+        return True
+
+    def _close_link(self, exc):
+        """Close the port and fail everything still waiting for a reply."""
         self.connected = False
-        self.status = "DISCONNECTED"
+        if self.serial and self.serial.is_open:
+            try:
+                self.serial.close()
+            except Exception:
+                pass
+        reader = self._reader_thread
+        if reader and reader is not threading.current_thread():
+            reader.join(timeout=1)
+        self._reader_thread = None
+        self._fail_pending(exc)
+        with self._state_lock:
+            self.moving_axes.clear()
+            self._targets.clear()
+            self._commanded.clear()
+            self._state = self._state.replace(moving_axes=frozenset())
+
+    def _on_link_lost(self, exc):
+        """Called from the reader or a writer when the port fails."""
+        # Reader and writer may both notice the failure: only one handles it
+        if not self._link_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.connected:
+                return
+            print(f"Link lost on {self.port}: {exc}")
+            self._close_link(ConnectionError(f"Link lost: {exc}"))
+            if self.auto_reconnect and self._want_connected:
+                self.status = "RECONNECTING"
+                self._supervisor_thread = threading.Thread(
+                    target=self._supervise,
+                    daemon=True
+                )
+                self._supervisor_thread.start()
+            else:
+                self._want_connected = False
+                self.status = "DISCONNECTED"
+        finally:
+            self._link_lock.release()
+        self.events.publish(ConnectionChanged(False, self.port))
+
+    def _supervise(self):
+        """Reopen the link with exponential backoff, then resync state."""
+        delay = RECONNECT_BACKOFF_MIN
+        lost_at = time.monotonic()
+        while self._want_connected and not self.connected:
+            port = self._find_port()
+            if port and self._open_link(port, quiet=True):
+                self.reconnects += 1
+                print(f"Reconnected to {port} after {time.monotonic() - lost_at:.2f} s")
+                self._resync()
+                self.events.publish(ConnectionChanged(True, port))
+                return
+            woken = self._supervisor_wakeup.wait(delay)
+            self._supervisor_wakeup.clear()
+            if self._supervisor_stop.is_set():
+                return
+            # A hotplug event is worth an immediate, fast-backoff retry
+            delay = RECONNECT_BACKOFF_MIN if woken else min(delay * 2, RECONNECT_BACKOFF_MAX)
+
+    def _on_ports_changed(self, ports):
+        """PortRegistry callback: a board may have come back."""
+        if self.status == "RECONNECTING":
+            self._supervisor_wakeup.set()
+
+    def _find_port(self):
+        """Locate the board again, even if it re-enumerated under a new name."""
+        if not self.serial_number:
+            return self.port
+        if self.port_registry is not None:
+            return self.port_registry.find_by_serial(self.serial_number)
+        try:
+            for info in serial.tools.list_ports.comports():
+                if info.serial_number == self.serial_number:
+                    return info.device
+        except Exception:
+            return self.port
+        # Not enumerated (yet)
+        return None
+
+    def _lookup_serial_number(self, port):
+        if self.port_registry is not None:
+            info = self.port_registry.get(port)
+            if info is not None:
+                return info.serial_number
+        try:
+            for info in serial.tools.list_ports.comports():
+                if info.device == port:
+                    return info.serial_number
+        except Exception:
+            pass
+        return None
+
+    def _resync(self):
+        """Refresh position and restore the motion profile after a reconnect."""
+        self.update_status()
+        if self.profile is not None:
+            self.set_profile(*self.profile)
+
+    def send_command_async(self, cmd, timeout=RESPONSE_TIMEOUT):
+        """Write a command and return a Future resolved by the reader thread.
+
+        The future's result is the reply line ("OK" or the telemetry line for
+        "S"). It fails with CommandError on ERR<n> and with TimeoutError if
+        the reply does not arrive before ``timeout`` seconds.
+        Blocks only while the pipeline window is full.
+        Returns None when not connected.
+        """
+        futures = self.send_batch_async([cmd], timeout)
+        return futures[0] if futures else None
 
-    def send_command(self, cmd):
+    def send_commands_async(self, cmds, timeout=RESPONSE_TIMEOUT):
+        """Pipeline several commands, keeping up to ``window`` of them in flight.
+
+        Returns one Future per command (see send_command_async), or None when
+        not connected. The caller only blocks while the window is full, so
+        throughput is bounded by serial bandwidth instead of per-line RTT.
+        """
         if not self.connected:
-            return False
-        
+            return None
+        futures = []
+        for cmd in cmds:
+            future = self.send_command_async(cmd, timeout)
+            if future is None:
+                break
+            futures.append(future)
+        return futures
+
+    def send_batch_async(self, cmds, timeout=RESPONSE_TIMEOUT):
+        """Encode several commands into one buffer and write it at once.
+
+        All commands that fit in the pipeline window go out in a single
+        write(); if the window fills up, the rest follows in further writes
+        as credit returns. Returns one Future per command, or None when not
+        connected.
+        """
+        if not self.connected:
+            return None
+
+        entries = [_PendingCommand(cmd, timeout) for cmd in cmds]
+        batch = []
+        for index, entry in enumerate(entries):
+            nbytes = len(entry.data)
+            if self.window.try_acquire(nbytes):
+                batch.append(entry)
+                continue
+            self._write_entries(batch)
+            batch = []
+            if not self.window.acquire(nbytes, timeout):
+                for skipped in entries[index:]:
+                    skipped.future.set_exception(
+                        FutureTimeoutError(f"Pipeline full, {skipped.cmd} not sent")
+                    )
+                break
+            batch.append(entry)
+        self._write_entries(batch)
+        return [entry.future for entry in entries]
+
+    def _write_entries(self, entries):
+        """Queue credited commands and write them with a single write() call."""
+        if not entries:
+            return
+        now = time.monotonic()
         with self.lock:
             try:
-                full_cmd = cmd + "\n"
-                self.serial.write(full_cmd.encode('utf-8'))
-                # We could wait for OK here, but for UI responsiveness 
-                # we might want to read in a separate thread or just fire-and-forget for now
-                # For simplicity, let's read one line
-                response = self.serial.readline().decode('utf-8').strip()
-                if response.startswith("ERR"):
-                    self.last_error = response
-                    print(f"Command Error: {response}")
-                    return False
-                return True
+                if not self.connected:
+                    raise ConnectionError("Disconnected")
+                for entry in entries:
+                    entry.deadline = now + entry.timeout
+                    self._pending.append(entry)
+                    self._track_motion(entry)
+                self.serial.write(b"".join(entry.data for entry in entries))
             except Exception as e:
                 print(f"Send error: {e}")
-                self.disconnect()
-                return False
+                for entry in entries:
+                    if entry in self._pending:
+                        self._pending.remove(entry)
+                    self.window.release(len(entry.data))
+                    entry.future.set_exception(e)
+                link_error = e
+            else:
+                link_error = None
+        if link_error is not None and self.connected:
+            threading.Thread(
+                target=self._on_link_lost,
+                args=(link_error,),
+                daemon=True
+            ).start()
+
+    def send_commands(self, cmds, timeout=RESPONSE_TIMEOUT):
+        """Pipeline several commands and wait for all replies.
+
+        Returns True only if every command was acknowledged with OK.
+        """
+        cmds = list(cmds)
+        futures = self.send_commands_async(cmds, timeout)
+        if futures is None or len(futures) < len(cmds):
+            return False
+        ok = True
+        for cmd, future in zip(cmds, futures):
+            try:
+                future.result(timeout=timeout)
+            except CommandError as e:
+                self.last_error = str(e)
+                print(f"Command Error: {cmd} -> {e}")
+                ok = False
+            except Exception as e:
+                print(f"Send error: {cmd} -> {e}")
+                ok = False
+        return ok
+
+    def send_command(self, cmd, timeout=RESPONSE_TIMEOUT):
+        future = self.send_command_async(cmd, timeout)
+        if future is None:
+            return False
+        try:
+            future.result(timeout=timeout)
+            return True
+        except CommandError as e:
+            self.last_error = str(e)
+            print(f"Command Error: {e}")
+            return False
+        except FutureTimeoutError:
+            print(f"Command timeout: {cmd}")
+            return False
+        except Exception as e:
+            print(f"Send error: {e}")
+            return False
+
+    def _read_loop(self):
+        """Reader thread: owns incoming traffic and resolves pending commands."""
+        ser = self.serial
+        while self.connected:
+            try:
+                raw = ser.readline()
+            except Exception as e:
+                if self.connected:
+                    self._on_link_lost(e)
+                return
+            if raw:
+                try:
+                    self._handle_line(raw)
+                except Exception as e:
+                    # One malformed line must not stop the reader thread
+                    print(f"Error handling line {raw!r}: {e}")
+            elif self._pending:
+                # Idle line: time out commands the Mega never answered so
+                # their credit goes back to the window
+                done = []
+                with self.lock:
+                    self._expire_pending(done)
+                for pending, reply in done:
+                    self._resolve(pending, reply)
+
+    def _handle_line(self, raw):
+        """Match an incoming line (bytes) against the oldest pending command."""
+        telemetry = is_telemetry(raw)
+        if telemetry:
+            # Decoded from the raw bytes before anything else touches them
+            self._apply_status(raw)
+        line = raw.decode('utf-8', errors='ignore').strip()
+        if not line:
+            return
+
+        # Motion notifications from updateMotors() are never command replies
+        motion = _MOTION_EVENT.fullmatch(line)
+        if motion:
+            self._on_motion_event(motion.group(1), int(motion.group(2)) - 1)
+            return
+
+        done = []
+        unsolicited = False
+        with self.lock:
+            self._expire_pending(done)
+            head = self._pending[0] if self._pending else None
+
+            if telemetry:
+                if head is not None and head.cmd == "S":
+                    done.append((self._pending.popleft(), line))
+            elif line == "OK":
+                if head is not None:
+                    done.append((self._pending.popleft(), line))
+                else:
+                    unsolicited = True
+            elif line.startswith("ERR"):
+                if head is not None and head.error is None:
+                    head.error = line
+                    if head.cmd[:1] not in ACK_AFTER_ERROR_COMMANDS:
+                        done.append((self._pending.popleft(), line))
+                else:
+                    # e.g. the ERR5 emitted by the Mega's watchdog
+                    unsolicited = True
+            else:
+                unsolicited = True
+
+        for pending, reply in done:
+            self._resolve(pending, reply)
+        if unsolicited:
+            self._on_unsolicited(line)
+
+    def _expire_pending(self, done):
+        """Drop commands whose reply never arrived (caller holds the lock)."""
+        now = time.monotonic()
+        while self._pending and self._pending[0].deadline < now:
+            done.append((self._pending.popleft(), None))
+
+    def _resolve(self, pending, reply):
+        """Complete a command taken off the pending queue and return its credit."""
+        self.window.release(len(pending.data))
+        if pending.future.done():
+            return
+        if reply is None:
+            pending.future.set_exception(
+                FutureTimeoutError(f"No reply to {pending.cmd}")
+            )
+        elif pending.error:
+            if pending.axis is not None:
+                self._end_motion(pending.axis, forget=True)
+            pending.future.set_exception(CommandError(pending.error))
+            self.events.publish(RobotError(pending.error, pending.cmd))
+        else:
+            pending.future.set_result(reply)
+
+    def _fail_pending(self, exc):
+        with self.lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        for entry in pending:
+            if not entry.future.done():
+                entry.future.set_exception(exc)
+        self.window.reset()
+
+    def _on_motion_event(self, kind, axis):
+        """Publish a D<n> or ENDSTOP<n> (``axis`` is 0-based)."""
+        self._end_motion(axis, forget=(kind == "ENDSTOP"))
+        if kind == "ENDSTOP":
+            self.events.publish(EndstopHit(axis))
+        else:
+            self.events.publish(MoveDone(axis))
+
+    def _on_unsolicited(self, line):
+        """Publish lines that do not answer a command (the watchdog ERR5, ...)."""
+        if line.startswith("ERR"):
+            self.last_error = line
+            print(f"Robot Error: {line}")
+            self.events.publish(RobotError(line))
+        else:
+            print(f"Ignored line from robot: {line!r}")
+
+    def _track_motion(self, entry):
+        """Mark the axis of a move command as moving until it reports back."""
+        cmd = entry.cmd
+        op = cmd[:1]
+        if op == "E":
+            with self._state_lock:
+                self.moving_axes.clear()
+                self._targets.clear()
+                self._commanded.clear()
+                self._update_motion_status()
+        elif op in ("K", "H") and len(cmd) > 1 and cmd[1] in "123456":
+            # The axis stops somewhere in between (or homes): position unknown
+            with self._state_lock:
+                self._commanded.pop(int(cmd[1]) - 1, None)
+        elif entry.axis is not None:
+            axis = entry.axis
+            try:
+                value = float(cmd[2:])
+            except ValueError:
+                return
+            with self._state_lock:
+                if op == "A":
+                    self._commanded[axis] = value
+                elif axis in self._commanded:
+                    self._commanded[axis] += value
+                if op == "M" and value == 0:
+                    return
+                # A move to the current position never produces D<n>
+                self._targets[axis] = value if op == "A" else None
+                self.moving_axes.add(axis)
+                self._update_motion_status()
+
+    def _end_motion(self, axis, forget=False):
+        """The axis stopped; with ``forget`` its commanded target is unknown."""
+        with self._state_lock:
+            self.moving_axes.discard(axis)
+            self._targets.pop(axis, None)
+            if forget:
+                self._commanded.pop(axis, None)
+            self._update_motion_status()
+
+    def _update_motion_status(self):
+        """Publish moving_axes and the IDLE/MOVING status (holds _state_lock)."""
+        state = self._state
+        status = state.status
+        if status in ("IDLE", "MOVING"):
+            status = "MOVING" if self.moving_axes else "IDLE"
+        self._state = state.replace(status=status, moving_axes=frozenset(self.moving_axes))
 
     def move_relative(self, axis_idx, steps):
         # M<axis_1_based><steps>
@@ -68,19 +718,97 @@ class RobotClient:
         cmd = f"A{axis_idx+1}{position:.2f}"
         return self.send_command(cmd)
 
+    def move_many(self, targets, timeout=RESPONSE_TIMEOUT, wait_all=False, profiles=None):
+        """Move several axes to absolute positions with a single write.
+
+        Args:
+            targets: {axis_idx: position_steps}
+            wait_all: wait for every axis, for callers that know each one
+                moves
+            profiles: {axis_idx: (speed, accel)} sent as Q<eje> lines in
+                the same write, before the targets (see trajectory_planner)
+
+        Returns:
+            MotionHandle that completes when every moving axis reported D<n>,
+            or None when not connected. Axes already at their target are
+            still sent but not waited for, since the Mega only reports D<n>
+            for axes that actually moved. "Already there" compares against
+            the last target this client commanded for the axis, falling back
+            to the last telemetry when that is unknown.
+        """
+        # The Mega parses positions with toInt(); integers keep every line
+        # short so a full 6-axis pose fits in its 64-byte RX buffer.
+        moves = {axis: int(round(pos)) for axis, pos in targets.items()}
+        cmds = []
+        for axis, (speed, accel) in sorted((profiles or {}).items()):
+            cmds.extend(axis_profile_commands(axis, speed, accel))
+        setup = len(cmds)
+        cmds.extend(f"A{axis+1}{pos}" for axis, pos in sorted(moves.items()))
+        if wait_all:
+            waiting = list(moves)
+        else:
+            with self._state_lock:
+                axes = self._state.axes
+                waiting = [axis for axis, pos in moves.items()
+                           if pos != self._commanded.get(axis, axes[axis])]
+        return self._send_motion_batch(cmds, sorted(moves), waiting, timeout, setup)
+
+    def move_many_relative(self, offsets, timeout=RESPONSE_TIMEOUT):
+        """Move several axes by relative steps with a single write.
+
+        Args:
+            offsets: {axis_idx: steps}; zero offsets are skipped.
+
+        Returns:
+            MotionHandle (see move_many), or None when not connected.
+        """
+        moves = {axis: int(round(steps)) for axis, steps in offsets.items()}
+        moves = {axis: steps for axis, steps in moves.items() if steps != 0}
+        cmds = [f"M{axis+1}{steps}" for axis, steps in sorted(moves.items())]
+        return self._send_motion_batch(cmds, sorted(moves), list(moves), timeout)
+
+    def _send_motion_batch(self, cmds, axes, waiting, timeout, setup=0):
+        """Write ``cmds``; the first ``setup`` lines are not moves (Q<eje>)."""
+        if not self.connected:
+            return None
+        # Subscribe before writing so no D<n> can slip past the handle
+        handle = MotionHandle(self.events, waiting)
+        futures = self.send_batch_async(cmds, timeout)
+        if futures is None:
+            handle.cancel()
+            return handle
+        for axis, future in zip(axes, futures[setup:]):
+            if axis in waiting:
+                handle._attach(axis, future)
+        return handle
+
+    def stop_axes(self, axes):
+        """Decelerate the given axes (0-based) to a stop with K<n>, without waiting."""
+        if not axes:
+            return None
+        return self.send_batch_async([f"K{axis+1}" for axis in sorted(axes)])
+
     def home_axis(self, axis_idx):
         # H<axis_1_based>
+        # handleHoming() blocks the Mega until the endstop is reached
         cmd = f"H{axis_idx+1}"
-        return self.send_command(cmd)
+        return self.send_command(cmd, timeout=HOMING_RESPONSE_TIMEOUT)
 
     def emergency_stop(self):
         return self.send_command("E")
 
     def set_profile(self, speed, accel):
-        # P<speed> <accel>
-        # Example: P1000 500
-        cmd = f"P{int(speed)} {int(accel)}"
-        return self.send_command(cmd)
+        # PV<speed> and PA<accel> (handleProfile() takes one parameter per line)
+        # Example: PV1000, PA500
+        self.profile = (int(speed), int(accel))
+        return self.send_commands([f"PV{int(speed)}", f"PA{int(accel)}"])
+
+    def set_axis_profile(self, axis_idx, speed, accel):
+        """Speed and acceleration of one axis (Q<eje>V / Q<eje>A).
+
+        set_profile() sets every axis again, replacing these values.
+        """
+        return self.send_commands(axis_profile_commands(axis_idx, speed, accel))
 
     def reset_alarm(self):
         # Assuming M999 or similar to reset alarm/unlock
@@ -95,10 +823,14 @@ class RobotClient:
 
     @staticmethod
     def scan_ports():
-        import glob
-        # Linux style
-        ports = glob.glob('/dev/ttyACM*') + glob.glob('/dev/ttyUSB*')
-        return ports
+        """Device names of the serial ports present right now."""
+        return [info.device for info in list_serial_ports()]
+
+    def available_ports(self):
+        """Device names from the hotplug registry (a fresh scan without one)."""
+        if self.port_registry is not None:
+            return [info.device for info in self.port_registry.ports()]
+        return self.scan_ports()
 
     def run_test(self, test_id):
         # T<test_id>
@@ -107,37 +839,45 @@ class RobotClient:
         return self.send_command(cmd)
 
     def update_status(self):
+        """Request a status line; the reader thread applies it to the state."""
         if not self.connected:
+            return False
+
+        future = self.send_command_async("S")
+        if future is None:
+            return False
+        try:
+            future.result(timeout=RESPONSE_TIMEOUT)
+            return True
+        except Exception as e:
+            print(f"Status update error: {e}")
+            return False
+
+    def _apply_status(self, raw):
+        """Parse a status line into the client state and publish it."""
+        telemetry = self.telemetry
+        if not parse_telemetry(raw, telemetry):
+            print(f"Bad status line: {raw!r}")
             return
 
-        # Send 'S' command to get status
-        # Expected format: "State:IDLE X:0.00 ... Endstops:000000"
-        
-        with self.lock:
-            try:
-                self.serial.write(b"S\n")
-                response = self.serial.readline().decode('utf-8').strip()
-                
-                if not response:
-                    return
+        changes = {
+            "axes": telemetry.positions,
+            "endstops": telemetry.endstops_bits(),
+        }
+        if telemetry.state is not None:
+            changes["status"] = telemetry.state
+        self._publish_state(**changes)
 
-                # Parse response
-                parts = response.split(' ')
-                for part in parts:
-                    if ':' in part:
-                        key, val = part.split(':')
-                        if key == "State":
-                            self.status = val
-                        elif key in ["X", "Y", "Z", "A", "B", "C"]:
-                            idx = ["X", "Y", "Z", "A", "B", "C"].index(key)
-                            try:
-                                self.axes[idx] = float(val)
-                            except ValueError:
-                                pass
-                        elif key == "Endstops":
-                            # Assuming binary string "000000" or similar
-                            # Store as raw string or parse bits
-                            self.endstops = val 
-            except Exception as e:
-                print(f"Status update error: {e}")
-                pass
+        # Settle axes whose absolute target was already reached
+        with self._state_lock:
+            axes = self._state.axes
+            settled = [axis for axis, target in self._targets.items()
+                       if target is not None and axes[axis] == target]
+            for axis in settled:
+                self.moving_axes.discard(axis)
+                del self._targets[axis]
+            if settled:
+                self._update_motion_status()
+
+        state = self._state
+        self.events.publish(Telemetry(raw, state.axes, state.endstops))
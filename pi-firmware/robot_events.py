@@ -0,0 +1,132 @@
+"""
+Robot Events - Typed notifications published by RobotClient.
+
+The Mega reports motion completion (D<n>) and limit hits (ENDSTOP<n>) on its
+own, without being polled. RobotClient turns those lines, command errors and
+telemetry replies into events so consumers can react immediately instead of
+waiting for the next status poll.
+
+Callbacks run on the client's reader thread: keep them short and hand UI
+work over to Tk with ``widget.after(0, ...)``.
+"""
+import threading
+import time
+
+
+class RobotEvent:
+    """Base class for all robot events."""
+
+    __slots__ = ("timestamp",)
+
+    def __init__(self):
+        self.timestamp = time.monotonic()
+
+
+class MoveDone(RobotEvent):
+    """An axis finished its motion (D<n>). ``axis`` is 0-based."""
+
+    __slots__ = ("axis",)
+
+    def __init__(self, axis):
+        super().__init__()
+        self.axis = axis
+
+    def __repr__(self):
+        return f"MoveDone(axis={self.axis})"
+
+
+class EndstopHit(RobotEvent):
+    """An axis was stopped by its MIN limit switch (ENDSTOP<n>). ``axis`` is 0-based."""
+
+    __slots__ = ("axis",)
+
+    def __init__(self, axis):
+        super().__init__()
+        self.axis = axis
+
+    def __repr__(self):
+        return f"EndstopHit(axis={self.axis})"
+
+
+class RobotError(RobotEvent):
+    """The Mega answered ERR<n>, either to ``command`` or unsolicited (None)."""
+
+    __slots__ = ("code", "command")
+
+    def __init__(self, code, command=None):
+        super().__init__()
+        self.code = code
+        self.command = command
+
+    def __repr__(self):
+        return f"RobotError(code={self.code!r}, command={self.command!r})"
+
+
+class Telemetry(RobotEvent):
+    """A status line was received and applied to the client state.
+
+    ``line`` holds the raw bytes as received from the port.
+    """
+
+    __slots__ = ("line", "axes", "endstops")
+
+    def __init__(self, line, axes, endstops):
+        super().__init__()
+        self.line = line
+        self.axes = axes
+        self.endstops = endstops
+
+    def __repr__(self):
+        return f"Telemetry(axes={self.axes}, endstops={self.endstops!r})"
+
+
+class ConnectionChanged(RobotEvent):
+    """The serial link went up or down (including automatic reconnects)."""
+
+    __slots__ = ("connected", "port")
+
+    def __init__(self, connected, port):
+        super().__init__()
+        self.connected = connected
+        self.port = port
+
+    def __repr__(self):
+        return f"ConnectionChanged(connected={self.connected}, port={self.port!r})"
+
+
+class EventBus:
+    """Minimal thread-safe publish/subscribe dispatcher keyed by event type.
+
+    Subscribing to a base class (e.g. RobotEvent) receives every subclass.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, event_type, callback):
+        """Register ``callback(event)``. Returns a function that unsubscribes it."""
+        with self._lock:
+            callbacks = list(self._subscribers.get(event_type, ()))
+            callbacks.append(callback)
+            self._subscribers[event_type] = callbacks
+
+        def unsubscribe():
+            self.unsubscribe(event_type, callback)
+        return unsubscribe
+
+    def unsubscribe(self, event_type, callback):
+        with self._lock:
+            callbacks = [c for c in self._subscribers.get(event_type, ()) if c is not callback]
+            self._subscribers[event_type] = callbacks
+
+    def publish(self, event):
+        # Callback lists are replaced, never mutated, so they can be read unlocked
+        for event_type in type(event).__mro__:
+            for callback in self._subscribers.get(event_type, ()):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Event callback error ({event!r}): {e}")
+            if event_type is RobotEvent:
+                break
@@ -0,0 +1,56 @@
+"""
+Robot State - Immutable, versioned snapshots of the client state.
+
+RobotClient updates its state from the reader thread, the supervisor thread
+and whichever thread sends commands, while the Tk thread reads it. Instead of
+mutating shared lists in place, every update builds a new RobotSnapshot and
+swaps it in with a single attribute assignment. Readers grab ``client.state``
+once and get a consistent view without locking; ``seq`` tells them whether
+anything changed since the last look.
+"""
+import time
+
+AXIS_COUNT = 6
+
+
+class RobotSnapshot:
+    """Read-only view of the robot at one point in time."""
+
+    __slots__ = ("seq", "timestamp", "connected", "status", "axes",
+                 "endstops", "moving_axes", "last_error")
+
+    def __init__(self, seq=0, connected=False, status="DISCONNECTED",
+                 axes=(0.0,) * AXIS_COUNT, endstops="000000",
+                 moving_axes=frozenset(), last_error=""):
+        setattr_ = object.__setattr__
+        setattr_(self, "seq", seq)
+        setattr_(self, "timestamp", time.monotonic())
+        setattr_(self, "connected", connected)
+        setattr_(self, "status", status)
+        setattr_(self, "axes", tuple(axes))
+        setattr_(self, "endstops", endstops)
+        setattr_(self, "moving_axes", frozenset(moving_axes))
+        setattr_(self, "last_error", last_error)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RobotSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("RobotSnapshot is immutable")
+
+    def replace(self, **changes):
+        """Return the next snapshot (seq + 1) with ``changes`` applied."""
+        fields = {
+            "connected": self.connected,
+            "status": self.status,
+            "axes": self.axes,
+            "endstops": self.endstops,
+            "moving_axes": self.moving_axes,
+            "last_error": self.last_error,
+        }
+        fields.update(changes)
+        return RobotSnapshot(seq=self.seq + 1, **fields)
+
+    def __repr__(self):
+        return (f"RobotSnapshot(seq={self.seq}, status={self.status!r}, "
+                f"axes={self.axes}, endstops={self.endstops!r})")
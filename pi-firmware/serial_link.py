@@ -0,0 +1,76 @@
+"""
+Serial Link - Opening the Mega's port without paying for an auto-reset.
+
+The Mega resets whenever DTR is pulsed, which happens when a port is opened
+with default settings. Instead of sleeping a fixed 2 s after every open, the
+helpers here keep DTR low when possible and then probe with "S" until a valid
+telemetry line proves the firmware is answering.
+"""
+import time
+
+import serial
+
+from config import READY_TIMEOUT, READY_PROBE_INTERVAL
+from telemetry import TelemetryState, parse_telemetry
+
+try:
+    import termios
+except ImportError:  # Windows
+    termios = None
+
+
+def open_port(port, baud, timeout, write_timeout=None, reset=False):
+    """Open ``port`` leaving the board running unless ``reset`` is True.
+
+    DTR/RTS are configured before the port is opened so pyserial does not
+    raise them. On POSIX, HUPCL is also cleared so closing the port does not
+    drop DTR either: later reopens (e.g. after a USB glitch) find the board
+    still running. The very first open after boot may still reset the board
+    if the kernel asserts DTR on its own; the readiness probe covers that.
+    """
+    ser = serial.Serial()
+    ser.port = port
+    ser.baudrate = baud
+    ser.timeout = timeout
+    ser.write_timeout = write_timeout
+    if not reset:
+        ser.dtr = False
+        ser.rts = False
+    ser.open()
+    if not reset and termios is not None:
+        try:
+            attrs = termios.tcgetattr(ser.fileno())
+            attrs[2] &= ~termios.HUPCL
+            termios.tcsetattr(ser.fileno(), termios.TCSANOW, attrs)
+        except (termios.error, OSError, ValueError):
+            pass
+    return ser
+
+
+def wait_until_ready(ser, deadline=READY_TIMEOUT, probe_interval=READY_PROBE_INTERVAL):
+    """Probe with "S" until a valid telemetry line arrives.
+
+    Returns the measured time-to-ready in seconds, or None if the board did
+    not answer within ``deadline`` seconds. Lines that are not telemetry
+    (bootloader noise, stale replies) are discarded.
+    """
+    state = TelemetryState()
+    original_timeout = ser.timeout
+    ser.timeout = probe_interval
+    start = time.monotonic()
+    try:
+        ser.reset_input_buffer()
+        while time.monotonic() - start < deadline:
+            ser.write(b"S\n")
+            probe_end = time.monotonic() + probe_interval
+            while time.monotonic() < probe_end:
+                raw = ser.readline()
+                if raw and parse_telemetry(raw, state):
+                    # Drop anything queued behind the probe reply
+                    ser.reset_input_buffer()
+                    return time.monotonic() - start
+                if not raw:
+                    break
+        return None
+    finally:
+        ser.timeout = original_timeout
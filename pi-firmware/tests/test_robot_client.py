@@ -0,0 +1,112 @@
+"""
+RobotClient against a fake Mega on a pseudo-terminal (Linux/macOS).
+
+    python -m unittest discover -s tests
+"""
+import os
+import pty
+import sys
+import threading
+import tty
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from robot_client import RobotClient  # noqa: E402
+
+
+class FakeMega:
+    """Answers S, M, A, K and E like the firmware: OK, then D<n> when a move ends."""
+
+    def __init__(self, move_time=0.05):
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.path = os.ttyname(slave)
+        self._slave = slave
+        self.move_time = move_time
+        self.positions = [0] * 6
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def close(self):
+        os.close(self.master)
+        os.close(self._slave)
+
+    def _write(self, text):
+        with self._lock:
+            os.write(self.master, text.encode())
+
+    def _run(self):
+        buf = b""
+        while True:
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                return
+            buf += data
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                self._handle(line.decode().strip())
+
+    def _handle(self, line):
+        op = line[:1]
+        if op == "S":
+            fields = self.positions + [1] * 6
+            self._write("S:" + ",".join(str(value) for value in fields) + "\n")
+        elif op in ("M", "A"):
+            axis = int(line[1]) - 1
+            value = int(float(line[2:]))
+            target = self.positions[axis] + value if op == "M" else value
+            if target != self.positions[axis]:
+                self.positions[axis] = target
+                threading.Timer(self.move_time, self._write, (f"D{axis + 1}\n",)).start()
+            self._write("OK\n")
+        elif op == "K":
+            self._write(f"D{line[1]}\nOK\n")
+        elif op in ("E", "P", "Q"):
+            self._write("OK\n")
+        elif line:
+            self._write("ERR1\n")
+
+
+class MoveManyTest(unittest.TestCase):
+    def setUp(self):
+        self.mega = FakeMega()
+        self.client = RobotClient(port=self.mega.path, auto_reconnect=False,
+                                  framing=False)
+        self.assertTrue(self.client.connect())
+
+    def tearDown(self):
+        self.client.disconnect()
+        self.mega.close()
+
+    def test_back_to_back_moves_sharing_an_axis(self):
+        # Telemetry still shows axis 0 at 0, but it was commanded to 100
+        # and does not move again: only axis 1 reports D<n>
+        first = self.client.move_many({0: 100})
+        self.assertTrue(first.wait(1))
+        second = self.client.move_many({0: 100, 1: 50})
+        self.assertTrue(second.wait(1))
+        self.assertEqual(second.remaining(), set())
+        third = self.client.move_many({0: 200, 1: 50})
+        self.assertTrue(third.wait(1))
+        self.assertEqual(third.remaining(), set())
+
+    def test_relative_move_updates_commanded_target(self):
+        self.assertTrue(self.client.move_many({2: 300}).wait(1))
+        self.assertTrue(self.client.move_many_relative({2: -100}).wait(1))
+        handle = self.client.move_many({2: 200, 3: 10})
+        self.assertTrue(handle.wait(1))
+
+    def test_stop_forgets_commanded_target(self):
+        self.assertTrue(self.client.move_many({4: 500}).wait(1))
+        self.client.stop_axes([4])[0].result(1)
+        # Position unknown after K: falls back to telemetry (0), so it waits
+        self.mega.positions[4] = 0
+        handle = self.client.move_many({4: 500})
+        self.assertTrue(handle.wait(1))
+        self.assertEqual(handle.remaining(), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Trajectory Planner - Synchronized multi-axis moves between waypoints.
+
+Each AccelStepper on the Mega ramps on its own, so with one global
+profile the axes of a pose change arrive at different times. For every
+segment the planner finds the axis that needs the longest time under its
+speed/accel limits (the leader) and gives every other axis the leader's
+profile scaled by their distance ratio. A trapezoid whose distance, speed
+and acceleration are scaled by the same factor takes the same time, so all
+axes start and finish the segment together.
+
+Profiles:
+    trapezoid  constant acceleration, which is what AccelStepper runs
+    s-curve    jerk-limited timing. AccelStepper cannot run an S-curve, so
+               each ramp uses the constant acceleration that reaches the
+               same speed in the same time as the jerk-limited ramp,
+               a = v / (v/a + a/j): S-curve segment times, gentler ramps.
+
+All segments are planned in one vectorized NumPy pass. PathExecutor sends
+each segment() through RobotClient.move_many(), which writes the
+Q<eje>V / Q<eje>A lines (per-axis profile) before the A<eje> targets.
+
+Running this module benchmarks plan() on random waypoints:
+
+    python trajectory_planner.py
+"""
+import numpy as np
+
+PROFILES = ("trapezoid", "s-curve")
+
+# Q<eje><V|A> values must be positive; slower axes are clamped to this
+MIN_RATE = 0.01
+
+
+def _limits(value, axes, name):
+    """Broadcast a scalar or per-axis limit to shape (axes,)."""
+    limits = np.broadcast_to(np.asarray(value, dtype=float), (axes,))
+    if np.any(limits <= 0):
+        raise ValueError(f"{name} must be positive")
+    return limits
+
+
+def segment_times(distance, speed, accel):
+    """Trapezoid duration of each move, element-wise (0 for no motion)."""
+    distance = np.abs(distance)
+    # Moves shorter than speed²/accel never reach ``speed``: triangular
+    full = distance >= speed * speed / accel
+    return np.where(full, distance / speed + speed / accel,
+                    2.0 * np.sqrt(distance / accel))
+
+
+class TrajectoryPlan:
+    """Per-segment step targets and per-axis profiles from plan().
+
+    Arrays have one row per segment and one column per axis; ``moving``
+    marks the axes that change in each segment.
+    """
+
+    __slots__ = ("targets", "moving", "speeds", "accels", "durations")
+
+    def __init__(self, targets, moving, speeds, accels, durations):
+        self.targets = targets
+        self.moving = moving
+        self.speeds = speeds
+        self.accels = accels
+        self.durations = durations
+
+    def __len__(self):
+        return len(self.durations)
+
+    @property
+    def total_time(self):
+        return float(self.durations.sum())
+
+    def segment(self, index):
+        """({axis: target}, {axis: (speed, accel)}) for the moving axes."""
+        axes = np.flatnonzero(self.moving[index]).tolist()
+        targets = {axis: int(self.targets[index, axis]) for axis in axes}
+        profiles = {axis: (float(self.speeds[index, axis]), float(self.accels[index, axis]))
+                    for axis in axes}
+        return targets, profiles
+
+    def __repr__(self):
+        return f"TrajectoryPlan({len(self)} segments, {self.total_time:.2f}s)"
+
+
+def plan(waypoints, max_speed, max_accel, profile="trapezoid", max_jerk=None, start=None):
+    """Plan synchronized segments through ``waypoints``.
+
+    Args:
+        waypoints: (n, axes) absolute positions in steps.
+        max_speed, max_accel: limits in steps/s and steps/s², scalar or
+            per axis.
+        profile: "trapezoid" or "s-curve" (needs ``max_jerk``, steps/s³).
+        start: current position; without it the first waypoint is the
+            start and the plan has n - 1 segments.
+
+    Returns:
+        TrajectoryPlan
+    """
+    points = np.rint(np.asarray(waypoints, dtype=float)).astype(np.int64)
+    if points.ndim != 2 or len(points) == 0:
+        raise ValueError("waypoints must be a non-empty (n, axes) array")
+    axes = points.shape[1]
+    speed = _limits(max_speed, axes, "max_speed")
+    accel = _limits(max_accel, axes, "max_accel")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r} (use {', '.join(PROFILES)})")
+    if profile == "s-curve":
+        if max_jerk is None:
+            raise ValueError("s-curve profile needs max_jerk")
+        jerk = _limits(max_jerk, axes, "max_jerk")
+        accel = speed / (speed / accel + accel / jerk)
+
+    if start is None:
+        origin, points = points[:1], points[1:]
+    else:
+        origin = np.rint(np.asarray(start, dtype=float)).astype(np.int64).reshape(1, axes)
+    distance = np.abs(np.diff(np.vstack([origin, points]), axis=0)).astype(float)
+
+    times = segment_times(distance, speed, accel)
+    rows = np.arange(len(distance))
+    leader = np.argmax(times, axis=1)
+    durations = times[rows, leader]
+    lead_distance = distance[rows, leader]
+    lead_accel = accel[leader]
+    # Speed the leader actually peaks at (short moves are triangular)
+    lead_peak = np.minimum(speed[leader], np.sqrt(lead_distance * lead_accel))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(lead_distance[:, None] > 0, distance / lead_distance[:, None], 0.0)
+    speeds = ratio * lead_peak[:, None]
+    accels = ratio * lead_accel[:, None]
+
+    # A follower with tighter limits than the leader stretches the segment:
+    # running it s times slower divides speeds by s and accelerations by s²
+    stretch = np.maximum(speeds / speed, np.sqrt(accels / accel)).max(axis=1, initial=0.0)
+    stretch = np.maximum(stretch, 1.0)
+    speeds /= stretch[:, None]
+    accels /= (stretch * stretch)[:, None]
+    durations = durations * stretch
+
+    moving = distance > 0
+    speeds = np.where(moving, np.maximum(speeds, MIN_RATE), 0.0)
+    accels = np.where(moving, np.maximum(accels, MIN_RATE), 0.0)
+    return TrajectoryPlan(points, moving, speeds, accels, durations)
+
+
+def _benchmark(segments=10000):
+    import timeit
+
+    rng = np.random.default_rng(0)
+    waypoints = rng.integers(0, 20000, size=(segments + 1, 6))
+    for profile in PROFILES:
+        seconds = min(timeit.repeat(
+            lambda: plan(waypoints, 1200, 500, profile, max_jerk=2000),
+            number=10, repeat=3)) / 10
+        result = plan(waypoints, 1200, 500, profile, max_jerk=2000)
+        print(f"{profile:10s} {segments} segments in {seconds * 1000:.1f} ms "
+              f"({result.total_time / 60:.0f} min of motion)")
+
+    # Every moving axis of a segment must take the segment's duration
+    check = plan(waypoints[:200], [1200, 1000, 800, 1500, 2000, 600], 500)
+    distance = np.abs(np.diff(waypoints[:200], axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        times = segment_times(distance, check.speeds, check.accels)
+    spread = np.abs(np.where(check.moving, times - check.durations[:, None], 0.0)).max()
+    print(f"max arrival spread: {spread * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -9,7 +9,8 @@ from ui.theme import COLORS, FONTS, DIMENSIONS
 class AxisSlider(ctk.CTkFrame):
     """Custom slider showing current value and max value with sliding thumb."""
     
-    def __init__(self, parent, min_value=0, max_value=360, unit="°", step=None, on_value_change=None):
+    def __init__(self, parent, min_value=0, max_value=360, unit="°", step=None, on_value_change=None,
+                 on_drag=None):
         super().__init__(
             parent,
             fg_color=COLORS["surface_hover"],  # Light gray track
@@ -23,6 +24,8 @@ class AxisSlider(ctk.CTkFrame):
         self.step = step
         self.current_value = min_value
         self.on_value_change = on_value_change
+        self.on_drag = on_drag  # Called continuously while the thumb is dragged
+        self.dragging = False
         
         self._build_ui()
         self._update_display()
@@ -146,13 +149,16 @@ class AxisSlider(ctk.CTkFrame):
             range_val = self.max_value - self.min_value
             new_value = self.min_value + (percentage * range_val)
             self.set_value(new_value, callback=False)
+            if self.on_drag:
+                self.on_drag(self.current_value)
     
     def _on_click(self, event):
         """Handle thumb click."""
-        pass  # Just for starting drag
+        self.dragging = True
     
     def _on_release(self, event):
         """Handle mouse release to trigger value change."""
+        self.dragging = False
         if self.on_value_change:
             self.on_value_change(self.current_value)
 
@@ -2,10 +2,11 @@
 Connection Selector - Dropdown component for serial port connection.
 """
 import customtkinter as ctk
-import serial.tools.list_ports
 import os
 from PIL import Image
 
+from port_registry import scan_ports
+
 from ui.theme import COLORS, FONTS, DIMENSIONS, get_frame_config
 
 # Icon paths
@@ -17,7 +18,7 @@ USB_ICON_PATH = os.path.join(ICONS_DIR, "usb.png")
 class ConnectionSelector(ctk.CTkFrame):
     """Dropdown selector for serial port connection with status display."""
     
-    def __init__(self, parent, robot_client, on_connection_change=None):
+    def __init__(self, parent, robot_client, on_connection_change=None, port_registry=None):
         super().__init__(
             parent,
             fg_color=COLORS["surface"],
@@ -28,11 +29,19 @@ class ConnectionSelector(ctk.CTkFrame):
         
         self.client = robot_client
         self.on_connection_change = on_connection_change
+        self.port_registry = port_registry
         self.dropdown_visible = False
         self.dropdown_frame = None
         
         self._build_ui()
         self._update_display()
+        
+        # Keep an open dropdown current as boards are plugged/unplugged
+        if port_registry is not None:
+            self._unsubscribe_ports = port_registry.subscribe(
+                lambda ports: self.after(0, self._on_ports_changed)
+            )
+            self.bind("<Destroy>", self._on_destroy, add="+")
     
     def _build_ui(self):
         """Build the main selector content."""
@@ -302,12 +311,21 @@ class ConnectionSelector(ctk.CTkFrame):
                 self._hide_dropdown()
     
     def _scan_ports(self):
-        """Scan for available serial ports."""
-        try:
-            ports = serial.tools.list_ports.comports()
-            return [(p.device, p.description) for p in ports]
-        except:
-            return []
+        """Available serial ports (cached by the registry when there is one)."""
+        if self.port_registry is not None:
+            ports = self.port_registry.ports()
+        else:
+            ports = scan_ports()
+        return [(p.device, p.description) for p in ports]
+    
+    def _on_ports_changed(self):
+        """Rebuild the dropdown if it is open (runs on the Tk thread)."""
+        if self.dropdown_visible:
+            self._show_dropdown()
+    
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self._unsubscribe_ports()
     
     def _connect_to_port(self, port):
         """Connect to a specific port."""
@@ -334,6 +352,8 @@ class ConnectionSelector(ctk.CTkFrame):
     
     def _refresh_dropdown(self):
         """Refresh the dropdown with updated port list."""
+        if self.port_registry is not None:
+            self.port_registry.refresh()
         self._show_dropdown()
     
     def _update_display(self):
@@ -341,7 +361,17 @@ class ConnectionSelector(ctk.CTkFrame):
         # Soft desaturated red for disconnected state
         DISCONNECTED_RED = "#B88888"
         
-        if self.client.connected:
+        if self.client.status == "RECONNECTING":
+            # Link dropped: keep the port, the client is retrying on its own
+            self.lbl_port.configure(
+                text=self.client.port,
+                text_color=COLORS["text_primary"]
+            )
+            self.lbl_status.configure(
+                text="Reconnecting...",
+                text_color=COLORS["warning"]
+            )
+        elif self.client.connected:
             # Connected: bold dark port, green status
             self.lbl_port.configure(
                 text=self.client.port,
@@ -364,5 +394,6 @@ class ConnectionSelector(ctk.CTkFrame):
     
     def update_status(self, status):
         """Update status from external source."""
+        self._update_display()
         if self.client.connected:
             self.lbl_status.configure(text=status)
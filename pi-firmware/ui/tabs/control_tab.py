@@ -5,6 +5,7 @@ Minimalistic light theme with icons.
 import customtkinter as ctk
 
 from config import AXIS_NAMES, JOG_STEP_SIZE
+from command_coalescer import AxisCommandCoalescer
 from ui.theme import (
     COLORS, ICONS, FONTS, DIMENSIONS,
     get_button_config, get_frame_config, get_label_config
@@ -16,9 +17,12 @@ from ui.components.axis_slider import AxisSlider
 class ControlTab(ctk.CTkFrame):
     """Main control tab with axis controls and connection management."""
     
-    def __init__(self, parent, robot_client):
+    def __init__(self, parent, robot_client, port_registry=None):
         super().__init__(parent, fg_color="transparent")
         self.client = robot_client
+        self.port_registry = port_registry
+        # Slider targets go through a latest-wins, rate-limited queue
+        self.move_coalescer = AxisCommandCoalescer(robot_client)
         self.axis_sliders = []  # AxisSlider components
         self.axis_rows = []
         
@@ -34,7 +38,8 @@ class ControlTab(ctk.CTkFrame):
         self.connection_selector = ConnectionSelector(
             header,
             self.client,
-            on_connection_change=self._on_connection_change
+            on_connection_change=self._on_connection_change,
+            port_registry=self.port_registry
         )
         self.connection_selector.pack(side="left")
         
@@ -97,7 +102,8 @@ class ControlTab(ctk.CTkFrame):
         slider = AxisSlider(
             row,
             max_value=360,
-            on_value_change=lambda v, idx=axis_idx: self._on_slider_change(idx, v)
+            on_value_change=lambda v, idx=axis_idx: self._on_slider_change(idx, v),
+            on_drag=lambda v, idx=axis_idx: self._on_slider_change(idx, v)
         )
         slider.pack(side="left", fill="x", expand=True, padx=(8, 8))
         self.axis_sliders.append(slider)
@@ -135,15 +141,22 @@ class ControlTab(ctk.CTkFrame):
     def _on_connection_change(self, connected):
         """Handle connection state changes from the selector."""
         # Could add additional logic here if needed
+        # (the coalescer drops unsent targets on ConnectionChanged itself)
         pass
     
+    def destroy(self):
+        """Stop the slider stream before the widgets go away."""
+        self.move_coalescer.close()
+        super().destroy()
+    
     def _on_slider_change(self, axis_idx, value):
-        """Handle slider value change."""
-        # Move axis to the slider position
-        self.client.move_absolute(axis_idx, value)
+        """Handle slider value change (also streamed while dragging)."""
+        # Only the newest target per axis reaches the robot
+        self.move_coalescer.submit(axis_idx, value)
     
     def _emergency_stop(self):
         """Trigger emergency stop."""
+        self.move_coalescer.cancel()
         self.client.emergency_stop()
     
     def _jog_axis(self, axis_idx, steps):
@@ -164,6 +177,6 @@ class ControlTab(ctk.CTkFrame):
         
         # Update axis sliders with positions
         for idx, slider in enumerate(self.axis_sliders):
-            if idx < len(axis_positions):
+            if idx < len(axis_positions) and not slider.dragging:
                 slider.set_value(axis_positions[idx])
 
@@ -4,6 +4,8 @@ Minimalistic light theme.
 """
 import customtkinter as ctk
 
+from config import PATHS_PAGE_SIZE
+from path_executor import PathExecutor, PAUSED, ACTIVE_STATES
 from ui.theme import (
     COLORS, ICONS, DIMENSIONS,
     get_button_config, get_frame_config, get_label_config
@@ -17,6 +19,15 @@ class PathsTab(ctk.CTkFrame):
         super().__init__(parent, fg_color="transparent")
         self.path_manager = path_manager
         self.client = robot_client
+        # Rows shown so far; more are loaded a page at a time
+        self._shown = 0
+        self.more_button = None
+        # Progress arrives on the executor thread; the UI is updated via after()
+        self.executor = PathExecutor(
+            robot_client,
+            on_progress=lambda *progress: self.after(0, self._show_progress, *progress)
+        )
+        self.running_name = None
         
         self._build_content()
         self.refresh_paths()
@@ -64,6 +75,55 @@ class PathsTab(ctk.CTkFrame):
         )
         self.path_list.pack(fill="both", expand=True, padx=8, pady=(0, 8))
         
+        # Result of the last simplification (shown on demand)
+        self.message_label = ctk.CTkLabel(
+            card,
+            text="",
+            **get_label_config("muted")
+        )
+        
+        # Run controls (shown while a path runs)
+        self.run_bar = ctk.CTkFrame(card, fg_color="transparent")
+        
+        self.run_label = ctk.CTkLabel(
+            self.run_bar,
+            text="",
+            **get_label_config("muted")
+        )
+        self.run_label.pack(side="left")
+        
+        self.abort_button = ctk.CTkButton(
+            self.run_bar,
+            text=ICONS["stop"],
+            **get_button_config("icon"),
+            command=self.executor.abort
+        )
+        self.abort_button.pack(side="right", padx=2)
+        
+        self.step_button = ctk.CTkButton(
+            self.run_bar,
+            text="Step",
+            width=60,
+            **get_button_config("default"),
+            command=self.executor.step
+        )
+        self.step_button.pack(side="right", padx=2)
+        
+        self.pause_button = ctk.CTkButton(
+            self.run_bar,
+            text="Pause",
+            width=70,
+            **get_button_config("default"),
+            command=self._toggle_pause
+        )
+        self.pause_button.pack(side="right", padx=2)
+        
+        self.run_progress = ctk.CTkProgressBar(
+            self.run_bar,
+            progress_color=COLORS["accent"]
+        )
+        self.run_progress.pack(side="left", fill="x", expand=True, padx=8)
+        
         # Empty state (shown when no paths)
         self.empty_label = ctk.CTkLabel(
             self.path_list,
@@ -77,18 +137,38 @@ class PathsTab(ctk.CTkFrame):
         for widget in self.path_list.winfo_children():
             if widget != self.empty_label:
                 widget.destroy()
+        self._shown = 0
+        self.more_button = None
         
-        paths = self.path_manager.get_path_names()
-        
-        if not paths:
+        if not self.path_manager.count_paths():
             self.empty_label.pack(pady=20)
         else:
             self.empty_label.pack_forget()
-            for name in paths:
-                self._create_path_row(name)
+            self._show_more()
     
-    def _create_path_row(self, name):
+    def _show_more(self):
+        """Append the next page of rows, reading only the path index."""
+        if self.more_button is not None:
+            self.more_button.destroy()
+            self.more_button = None
+        
+        for info in self.path_manager.list_path_info(self._shown, PATHS_PAGE_SIZE):
+            self._create_path_row(info)
+            self._shown += 1
+        
+        remaining = self.path_manager.count_paths() - self._shown
+        if remaining > 0:
+            self.more_button = ctk.CTkButton(
+                self.path_list,
+                text=f"Show more ({remaining})",
+                **get_button_config("default"),
+                command=self._show_more
+            )
+            self.more_button.pack(pady=8)
+    
+    def _create_path_row(self, info):
         """Create a path list item."""
+        name = info.name
         row = ctk.CTkFrame(
             self.path_list,
             fg_color=COLORS["surface_hover"],
@@ -113,12 +193,11 @@ class PathsTab(ctk.CTkFrame):
             **get_label_config()
         ).pack(side="left")
         
-        # Point count (if available)
-        points = self.path_manager.get_path(name)
-        if points:
+        # Point count and estimated run time, from the index
+        if info.point_count:
             ctk.CTkLabel(
                 info_frame,
-                text=f"  •  {len(points)} points",
+                text=f"  •  {info.point_count} points  •  ~{info.duration:.0f} s",
                 **get_label_config("muted")
             ).pack(side="left")
         
@@ -133,6 +212,13 @@ class PathsTab(ctk.CTkFrame):
             command=lambda n=name: self._run_path(n)
         ).pack(side="left")
         
+        ctk.CTkButton(
+            btn_frame,
+            text=ICONS["simplify"],
+            **get_button_config("icon"),
+            command=lambda n=name: self._simplify_path(n)
+        ).pack(side="left")
+        
         ctk.CTkButton(
             btn_frame,
             text=ICONS["delete"],
@@ -154,8 +240,45 @@ class PathsTab(ctk.CTkFrame):
     
     def _run_path(self, name):
         """Run a saved path."""
-        # TODO: Implement path execution
-        print(f"Running path: {name}")
+        points = self.path_manager.get_path(name)
+        if not points:
+            print(f"Path {name} has no points")
+            return
+        if self.executor.start(points):
+            self.running_name = name
+        else:
+            print(f"Cannot run {name}: not connected or a path is running")
+    
+    def _simplify_path(self, name):
+        """Drop redundant points from a saved path and show what it saved."""
+        result = self.path_manager.simplify_path(name)
+        if result is None:
+            return
+        if not self.message_label.winfo_ismapped():
+            self.message_label.pack(fill="x", padx=16, pady=(0, 8), before=self.path_list)
+        self.message_label.configure(text=f"{name}: {result}")
+        if result.removed:
+            self.refresh_paths()
+    
+    def _toggle_pause(self):
+        """Pause at the next pose, or resume a paused path."""
+        if self.executor.state == PAUSED:
+            self.executor.resume()
+        else:
+            self.executor.pause()
+    
+    def _show_progress(self, state, index, total):
+        """Reflect executor progress (runs on the Tk thread)."""
+        if not self.run_bar.winfo_ismapped():
+            self.run_bar.pack(fill="x", padx=16, pady=(0, 12), before=self.path_list)
+        self.run_label.configure(text=f"{self.running_name}  {index}/{total}  {state.lower()}")
+        self.run_progress.set(index / total if total else 0)
+        self.pause_button.configure(text="Resume" if state == PAUSED else "Pause")
+        
+        active = state in ACTIVE_STATES
+        self.pause_button.configure(state="normal" if active else "disabled")
+        self.step_button.configure(state="normal" if state == PAUSED else "disabled")
+        self.abort_button.configure(state="normal" if active else "disabled")
     
     def _delete_path(self, name):
         """Delete a path after confirmation."""
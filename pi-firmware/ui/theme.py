@@ -54,6 +54,7 @@ ICONS = {
     "add": "+",          # New/create
     "play": "▶",         # Play/run
     "edit": "✎",         # Edit
+    "simplify": "≈",     # Simplify path
     "delete": "✕",       # Delete/close
     
     # Status
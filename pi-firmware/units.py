@@ -0,0 +1,95 @@
+"""
+Units - Per-axis conversion from degrees/radians to motor steps.
+
+The broker's config.yaml describes each axis with ``steps_per_rev`` and an
+optional ``gear_ratio``. StepConverter turns that into a steps-per-unit table
+once, at load time, so converting a command is a single multiply.
+
+Units:
+    S  steps (no conversion)
+    G  degrees
+    R  radians
+
+Relative moves (``relative=True``) carry the rounding remainder per axis, so
+repeating e.g. ``M10.1G`` a thousand times ends where ``M1100G`` would instead
+of drifting by up to half a step per move. Absolute moves reset the carry to
+the rounding error of their own target.
+"""
+import math
+
+AXIS_COUNT = 6
+UNITS = ("S", "G", "R")
+
+
+class StepConverter:
+    """Precomputed steps-per-unit table with per-axis remainder carry.
+
+    ``axes_cfg`` maps the 1-based axis number (int or str) to a dict with
+    ``steps_per_rev`` and optionally ``gear_ratio``.
+    """
+
+    def __init__(self, axes_cfg, axis_count=AXIS_COUNT):
+        self.axis_count = axis_count
+        # _factors[axis][unit] for 1-based axes; index 0 is unused
+        self._factors = [None] * (axis_count + 1)
+        self._remainder = [0.0] * (axis_count + 1)
+        for axis in range(1, axis_count + 1):
+            cfg = axes_cfg.get(axis, axes_cfg.get(str(axis)))
+            if not cfg or "steps_per_rev" not in cfg:
+                raise KeyError(f"Missing steps_per_rev for axis {axis}")
+            steps_per_output_rev = float(cfg["steps_per_rev"]) * float(cfg.get("gear_ratio", 1))
+            self._factors[axis] = {
+                "S": 1.0,
+                "G": steps_per_output_rev / 360.0,
+                "R": steps_per_output_rev / (2.0 * math.pi),
+            }
+
+    @classmethod
+    def from_config(cls, path, axis_count=AXIS_COUNT):
+        """Converter for the ``axes`` section of the broker's config.yaml."""
+        import yaml
+        with open(path, "r") as f:
+            cfg = yaml.safe_load(f) or {}
+        return cls(cfg.get("axes") or {}, axis_count)
+
+    def factor(self, axis, unit):
+        """Steps per one ``unit`` on ``axis`` (1-based)."""
+        return self._factors[axis][unit]
+
+    def to_steps(self, axis, value, unit="S", relative=False):
+        """Convert ``value`` in ``unit`` to an integer step count for ``axis``."""
+        if unit == "S":
+            steps = int(round(value))
+            if not relative:
+                self._remainder[axis] = 0.0
+            return steps
+        exact = value * self._factors[axis][unit]
+        if relative:
+            exact += self._remainder[axis]
+        steps = int(round(exact))
+        self._remainder[axis] = exact - steps
+        return steps
+
+    def to_units(self, axis, steps, unit="G"):
+        """Inverse conversion: ``steps`` on ``axis`` expressed in ``unit``."""
+        return steps / self._factors[axis][unit]
+
+    def reset_remainder(self, axis=None):
+        """Forget the carried remainder (e.g. after homing zeroes the axis)."""
+        if axis is None:
+            self._remainder = [0.0] * (self.axis_count + 1)
+        else:
+            self._remainder[axis] = 0.0
+
+    def convert_batch(self, points, unit="G"):
+        """Convert absolute poses to steps in one pass.
+
+        ``points`` is a sequence of poses, each a sequence of per-axis values
+        starting at axis 1 (as stored by PathManager). Returns a list of
+        tuples of ints. Does not touch the relative-move remainder.
+        """
+        factors = [self._factors[axis][unit] for axis in range(1, self.axis_count + 1)]
+        return [
+            tuple(int(round(value * factor)) for value, factor in zip(point, factors))
+            for point in points
+        ]